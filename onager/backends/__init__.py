@@ -1,3 +1,4 @@
 __all__ = ['local', 'gridengine', 'slurm']
-from . import local, gridengine, slurm
+# The backend modules are imported by prepare_backend() when needed, so that importing the
+# backend names (e.g. for the CLI's argument choices) stays cheap
 from .prepare_backend import prepare_backend
@@ -1,19 +1,44 @@
 from datetime import datetime, timedelta
+from itertools import chain
+import math
 import os
-import subprocess
 import sys
 
 from ..config import get_active_config
 from ..constants import default_logs_folder
+from ..balance import get_task_weights, pack_subjob_groups
+from ..cache import FINGERPRINT_VAR
+from ..jobfile import get_index_path, write_commands_file
+from ..logs import get_shard_cmds
+from ..submit import submit_commands, parse_jobid
+from ..subjobsfilemanager import SubjobsFileManager
+from ..taskset import TaskSet
 from ..utils import update_jobindex, insert_second_to_last
+from ..utils import compute_subjobs_filename, split_tasklist_into_subjob_groups
 from ..history import add_new_history_entry
+from ..state import StateRecorder
 
 class Backend:
     def __init__(self):
         self.name = 'generic_backend'
         self.header = '#!/bin/bash'
-        self.body = '\npython -m onager.worker {} {} \n'
+        self.body = '\npython -m onager.worker {} {} {} \n'
         self.multiworker_body = '\npython -m onager.multiworker {} \n'
+        # Looks up the task's command in the commands file (see onager.jobfile) and replaces the
+        # shell with it, so that no Python process starts on the per-task path
+        self.native_body = '\n'.join([
+            '',
+            'ONAGER_TASK_ID={task_id}',
+            'ONAGER_OFFSET=$(( $(od -An -t u8 -j $((ONAGER_TASK_ID * 8)) -N 8 {index}) + 0 ))',
+            'if [ $ONAGER_OFFSET -eq 0 ]; then',
+            '    echo "No command for task $ONAGER_TASK_ID in {commands}" >&2',
+            '    exit 1',
+            'fi',
+            'ONAGER_CMD=$(tail -c +$ONAGER_OFFSET {commands} | head -n 1)',
+            'echo "Launching worker: $ONAGER_CMD"',
+            'exec /bin/sh -c "$ONAGER_CMD"',
+            '',
+        ])
         self.footer = ''
 
         self.task_id_var = r'$TASK_ID'
@@ -21,7 +46,11 @@ class Backend:
 
     def get_body(self, tasks_file, args):
         if args.tasks_per_node == 1:
-            return self.body.format(tasks_file, self.task_id_var)
+            if getattr(args, 'wrapper', 'python') == 'native':
+                commands_path = write_commands_file(tasks_file)
+                return self.native_body.format(task_id=self.task_id_var, commands=commands_path,
+                                               index=get_index_path(commands_path))
+            return self.body.format(tasks_file, self.task_id_var, self.job_id_var)
         else:
             body = self.multiworker_body
             args_str_list = []
@@ -29,13 +58,56 @@ class Backend:
             args_str_list.append('--logging-jobname {}'.format(args.jobname))
             args_str_list.append('--logging-multijobid {}'.format(self.job_id_var))
             args_str_list.append('--logging-backend {}'.format(args.backend))
-            args_str_list.append('--subjob-group-id {}'.format(self.task_id_var))
+            if getattr(args, 'work_queue', False):
+                args_str_list.append('--subjob-group-id {} --work-queue'.format(
+                    args.subjob_group_id))
+            else:
+                args_str_list.append('--subjob-group-id {}'.format(self.task_id_var))
             args_str_list.append('--max-subjobs {}'.format(args.max_tasks_per_node))
+            args_str_list.append('--cpus {} --mem {}'.format(args.cpus, args.mem))
+            for flag in ['pin_cpus', 'mem_admission', 'mem_limit', 'shard_logs', 'host_slots']:
+                if getattr(args, flag, False):
+                    args_str_list.append('--' + flag.replace('_', '-'))
+            if getattr(args, 'forkserver', False):
+                args_str_list.append('--forkserver')
+                if args.preload:
+                    args_str_list.append('--preload {}'.format(' '.join(args.preload)))
             return body.format(' '.join(args_str_list))
 
+    def add_subjob_groups(self, args):
+        """Write the subjob groups for multiworker mode, and return the ids of the nodes to submit
+
+        Normally each node runs its own group of tasks_per_node tasks: consecutive tasks, or (with
+        --balance-weights or --balance-history) groups with balanced estimated costs. With
+        --work-queue, all of the tasks go in a single group, and every node pulls tasks from it
+        until it is drained.
+        """
+        sfm = SubjobsFileManager(compute_subjobs_filename(args.jobfile))
+        if not getattr(args, 'work_queue', False):
+            taskset = TaskSet.from_string(args.tasklist)
+            weights = get_task_weights(args, taskset)
+            if weights is None:
+                list_of_tasklist_strings = split_tasklist_into_subjob_groups(args.tasklist,
+                                                                             args.tasks_per_node)
+            else:
+                list_of_tasklist_strings = pack_subjob_groups(taskset, args.tasks_per_node, weights)
+            return sfm.add_subjobs(list_of_tasklist_strings)
+        args.subjob_group_id = sfm.add_subjobs([args.tasklist])[0]
+        n_nodes = math.ceil(len(TaskSet.from_string(args.tasklist)) / args.tasks_per_node)
+        return list(range(1, n_nodes + 1))
+
     def wrap_tasks(self, tasks_file, args):
         config = get_active_config()
-        header = '\n'.join((self.header, config[self.name]['header']))
+        header = self.header
+        if getattr(args, 'shard_logs', False):
+            # Redirect the wrapper's own output before anything else runs
+            shard_log_dir = os.path.join(self.get_log_dir(),
+                                         '{}_{}'.format(args.jobname, self.job_id_var))
+            header = '\n'.join((header, get_shard_cmds(shard_log_dir, self.task_id_var)))
+        header = '\n'.join((header, config[self.name]['header']))
+        if getattr(args, 'cache', False):
+            header = '\n'.join((header, 'export {}={}'.format(FINGERPRINT_VAR,
+                                                                args.cache_fingerprint)))
         if args.venv is not None:
             venv_activate_path = os.path.join(os.path.normpath(args.venv), 'bin', 'activate')
             header = '\n'.join((header, 'source {}'.format(venv_activate_path)))
@@ -73,12 +145,28 @@ class Backend:
         return log_dir
 
     def generate_tasklist(self, commands):
-        ids = sorted(commands.keys())
-        tasklist = ','.join(map(str, ids))
-        return tasklist
+        return str(commands.get_taskset())
+
+    def get_array_tasks(self, array_ids, args):
+        """Return the TaskSet of tasks run by the specified array ids (or subjob groups)"""
+        if args.tasks_per_node == 1:
+            return array_ids
+        if getattr(args, 'work_queue', False):
+            return TaskSet.from_string(args.tasklist)
+        subjobs = SubjobsFileManager(compute_subjobs_filename(args.jobfile)).get_subjobs_dict()
+        return TaskSet.from_ids(chain.from_iterable(
+            TaskSet.from_string(subjobs[group_id]) for group_id in array_ids))
+
+    def get_job_arrays(self, jobs, args):
+        """Return an (offset, array_ids) pair for each job from get_job_list"""
+        job_arrays = getattr(self, 'job_arrays', None)
+        if job_arrays is None or len(job_arrays) != len(jobs):
+            return [(None, TaskSet.from_string(args.tasklist))] * len(jobs)
+        return job_arrays
 
     def launch(self, jobs, args, other_args):
-        jobids = []
+        job_entries = []
+        job_arrays = self.get_job_arrays(jobs, args)
 
         if len(other_args) != 0:
             additional_args = ' '.join(other_args)
@@ -86,14 +174,35 @@ class Backend:
 
         for job in jobs:
             print(job)
-            if not args.dry_run:
-                try:
-                    byte_str = subprocess.check_output(job, shell=True)
-                    jobid = byte_str.decode('utf-8').replace('\n','').split('.')[0]
-                    jobids.append(jobid)
-                except (subprocess.CalledProcessError, ValueError) as err:
-                    print(err)
-                    sys.exit()
-        job_entries = [(jobid, args.jobname, args.jobfile) for jobid in jobids]
+        if args.dry_run:
+            add_new_history_entry(args.jobname, args.dry_run)
+            return
+
+        results = submit_commands(jobs, max_workers=args.submit_workers,
+                                  max_rate=args.submit_rate, max_retries=args.submit_retries)
+        errors = []
+        for result, (offset, array_ids) in zip(results, job_arrays):
+            if result.error is not None:
+                errors.append(result)
+                continue
+            jobid = parse_jobid(result.output)
+            if jobid is None:
+                error = ('Unable to parse a job ID from the scheduler output {!r}; the job may '
+                         'have been submitted, but it was not recorded'.format(result.output))
+                errors.append(result._replace(output=None, error=error))
+                continue
+            tasklist = str(self.get_array_tasks(array_ids, args))
+            job_entries.append((jobid, args.jobname, args.jobfile, self.name, tasklist, offset))
+
+        # Record every successful submission, even if some of the others failed
         update_jobindex(job_entries, append=True)
+        failures = getattr(args, 'resume_failures', None)
+        native = getattr(args, 'wrapper', 'python') == 'native'
+        for jobid, _, _, _, tasklist, _ in job_entries:
+            StateRecorder(jobid).record_queued(tasklist, failures, native)
         add_new_history_entry(args.jobname, args.dry_run)
+        if errors:
+            for result in errors:
+                print('Submission failed: {}\n{}'.format(result.cmd, result.error))
+            print('{} of {} submissions failed.'.format(len(errors), len(jobs)))
+            sys.exit(1)
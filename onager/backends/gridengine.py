@@ -2,8 +2,8 @@ from datetime import timedelta
 import os
 
 from ._backend import Backend
-from ..subjobsfilemanager import SubjobsFileManager
-from ..utils import compute_subjobs_filename, split_tasklist_into_subjob_groups, condense_ids
+from ..taskset import TaskSet
+from ..utils import condense_ids
 
 class GridEngineBackend(Backend):
     def __init__(self):
@@ -12,19 +12,15 @@ class GridEngineBackend(Backend):
         self.task_id_var = r'$SGE_TASK_ID'
         self.job_id_var = r'$JOB_ID'
 
-    def generate_tasklist(self, commands):
-        ids = sorted(commands.keys())
-        tasklist = condense_ids(ids)
-        return tasklist
-
     def get_cancel_cmds(self, cancellations):
         cmds = []
         for cancellation in cancellations:
-            jobid, tasklist = cancellation
-            tasklist = condense_ids(tasklist)
+            jobid, taskset = cancellation
             cmd = "qdel {} ".format(jobid)
-            if tasklist is not None:
-                for taskblock in tasklist.split(','):
+            if taskset is None:
+                cmds.append(cmd.strip())
+            else:
+                for taskblock in taskset.to_gridengine():
                     cmds.append(cmd + "-t {}".format(taskblock))
         return cmds
 
@@ -75,11 +71,15 @@ class GridEngineBackend(Backend):
 
         # Logging
         log_dir = self.get_log_dir()
-        # Format is jobname_jobid_taskid.*
-        base_cmd += '-o {} '.format(os.path.join(
-            log_dir, r'\$JOB_NAME_\$JOB_ID_\$TASK_ID.o'))  # save stdout to file
-        base_cmd += '-e {} '.format(os.path.join(
-            log_dir, r'\$JOB_NAME_\$JOB_ID_\$TASK_ID.e'))  # save stderr to file
+        if args.shard_logs:
+            # The wrapper script redirects its own output to the sharded log files
+            base_cmd += '-o /dev/null -e /dev/null '
+        else:
+            # Format is jobname_jobid_taskid.*
+            base_cmd += '-o {} '.format(os.path.join(
+                log_dir, r'\$JOB_NAME_\$JOB_ID_\$TASK_ID.o'))  # save stdout to file
+            base_cmd += '-e {} '.format(os.path.join(
+                log_dir, r'\$JOB_NAME_\$JOB_ID_\$TASK_ID.e'))  # save stderr to file
 
         # The -terse flag causes qsub to print the jobid to stdout. We read the
         # jobid with subprocess.check_output()
@@ -97,10 +97,7 @@ class GridEngineBackend(Backend):
             tasklist = args.tasklist
             wrapper_filename = 'wrapper.sh'
         elif args.tasks_per_node > 1:
-            list_of_tasklist_strings = split_tasklist_into_subjob_groups(args.tasklist, args.tasks_per_node)
-            subjobs_filename = compute_subjobs_filename(args.jobfile)
-            sfm = SubjobsFileManager(subjobs_filename)
-            subjob_groupids = sfm.add_subjobs(list_of_tasklist_strings)
+            subjob_groupids = self.add_subjob_groups(args)
             tasklist = condense_ids(subjob_groupids)
             wrapper_filename = 'multiwrapper.sh'
 
@@ -109,6 +106,7 @@ class GridEngineBackend(Backend):
 
         # Split tasklist into blocks that GridEngine can understand
         task_blocks = tasklist.split(',')
+        self.job_arrays = [(None, TaskSet.from_string(task_block)) for task_block in task_blocks]
         return [
             base_cmd + "-t {} {}".format(task_block, wrapper_file) for task_block in task_blocks
         ]
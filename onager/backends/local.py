@@ -1,12 +1,20 @@
 import math
-from multiprocessing import Pool
 import os
 import socket
 
 from ._backend import Backend
+from ..cache import ResultCache
 from ..history import add_new_history_entry
-from ..worker import run_command_by_id
-from ..utils import expand_ids, load_jobfile, update_jobindex, get_next_index_id, cpu_count
+from ..engine import run_tasks
+from ..forkserver import ForkServer
+from ..hostslots import HostSlots
+from ..jobfile import Jobfile
+from ..logs import LOG_EXTENSIONS, get_shard, get_sharded_log_path
+from ..resources import ResourceScheduler, get_allowed_cpus
+from ..state import StateRecorder, get_completed_tasks
+from ..taskset import TaskSet
+from ..workqueue import WorkQueue
+from ..utils import update_jobindex, get_next_index_id, cpu_count
 
 class LocalBackend(Backend):
     def __init__(self, logging_name=None):
@@ -16,12 +24,14 @@ class LocalBackend(Backend):
             self.name = hostname
         else:
             self.name = logging_name
+        self.shard_dir = None
+        self._shards = set()
 
     def get_job_list(self, args):
-        return load_jobfile(args.jobfile)[0]
+        return Jobfile(args.jobfile)
 
     def get_next_jobid(self):
-        return 0
+        return get_next_index_id()
 
     def get_n_workers(self, task_ids, maxtasks, cpus):
         if maxtasks > 0:
@@ -33,31 +43,60 @@ class LocalBackend(Backend):
             n_workers = min(workers_needed, workers_available)
         return n_workers
 
-    def send_jobs_to_pool(self, n_workers, task_ids, quiet=False):
+    def get_scheduler(self, args, cpus_per_task, mem_per_task):
+        host_slots = None
+        if getattr(args, 'host_slots', False):
+            label = getattr(args, 'jobname', None) or getattr(args, 'logging_jobname', None)
+            host_slots = HostSlots(label)
+        scheduler = ResourceScheduler(cpus_per_task, mem_per_task,
+                                      pin_cpus=getattr(args, 'pin_cpus', False),
+                                      mem_admission=getattr(args, 'mem_admission', False),
+                                      mem_limit=getattr(args, 'mem_limit', False),
+                                      host_slots=host_slots)
+        return scheduler if scheduler.enabled else None
+
+    def get_forkserver(self, args):
+        if not getattr(args, 'forkserver', False):
+            return None
+        return ForkServer(args.preload or ())
+
+    def run_jobs(self, n_workers, task_ids, quiet=False, scheduler=None, recorder=None,
+                 cache=None, forkserver=None):
         if not quiet:
-            print('Starting multiprocessing pool with {} workers'.format(n_workers))
-        pool = Pool(n_workers, maxtasksperchild=1)# Each new tasks gets a fresh worker
-        pool.map(self.process_one_job, task_ids)
-        pool.close()
-        pool.join()
+            print('Running tasks with up to {} concurrent workers'.format(n_workers))
+        # A single event loop drives all of the task subprocesses
+        try:
+            run_tasks(self.generate_tasks(task_ids), n_workers, scheduler=scheduler,
+                      recorder=recorder, cache=cache, forkserver=forkserver)
+        finally:
+            if recorder is not None:
+                recorder.close()
 
     def launch(self, jobs, args, other_args):
         self.commands = jobs
         if len(other_args) != 0:
             raise RuntimeError("{}: Cannot pass in additional args {}".format(
                 self.name, ' '.join(other_args)))
-        log_name = '{}_{}'.format(args.jobname, self.get_next_jobid())
+        jobid = self.get_next_jobid()
+        log_name = '{}_{}'.format(args.jobname, jobid)
         self.log_path = os.path.join(self.get_log_dir(), log_name)
         os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
-        task_ids = expand_ids(args.tasklist)
+        if getattr(args, 'shard_logs', False):
+            self.shard_dir = self.log_path
+        task_ids = TaskSet.from_string(args.tasklist)
 
-        job_entries = [(get_next_index_id(), args.jobname, args.jobfile)]
+        job_entries = [(jobid, args.jobname, args.jobfile, self.name, str(task_ids), None)]
         update_jobindex(job_entries, append=True)
         add_new_history_entry(args.jobname, args.dry_run)
 
         n_workers = self.get_n_workers(task_ids, args.max_tasks, args.cpus)
         if not args.dry_run:
-            self.send_jobs_to_pool(n_workers, task_ids)
+            recorder = StateRecorder(jobid, host=self.name)
+            recorder.record_queued(task_ids, getattr(args, 'resume_failures', None))
+            scheduler = self.get_scheduler(args, args.cpus, args.mem)
+            cache = ResultCache(args.cache_fingerprint) if getattr(args, 'cache', False) else None
+            self.run_jobs(n_workers, task_ids, scheduler=scheduler, recorder=recorder, cache=cache,
+                          forkserver=self.get_forkserver(args))
 
     def multilaunch(self, jobs, args):
         self.commands = jobs
@@ -66,16 +105,37 @@ class LocalBackend(Backend):
         log_name = '{}'.format(args.subjob_group_id)
         self.log_path = os.path.join(subjob_log_dir, log_name)
         os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
-        task_ids = expand_ids(args.tasklist)
+        if getattr(args, 'shard_logs', False):
+            self.shard_dir = subjob_log_dir
+        # Skip any subjobs that already completed, in case this group is being restarted
+        completed = get_completed_tasks(args.logging_multijobid)
+        task_ids = TaskSet.from_string(args.tasklist) - completed
+        if not task_ids:
+            return
 
         n_workers = self.get_n_workers(task_ids, args.max_subjobs, cpus=1)
-        self.send_jobs_to_pool(n_workers, task_ids)
+        if getattr(args, 'work_queue', False):
+            # Every node indexes into the same group, so completed tasks are skipped as they are
+            # claimed rather than removed from the queue
+            queue = WorkQueue(TaskSet.from_string(args.tasklist), args.cursor_path)
+            task_ids = (task_id for task_id in queue if task_id not in completed)
+        # Split the node's cores and memory evenly among the concurrent subjobs
+        cpus_per_task = max(1, len(get_allowed_cpus()) // n_workers)
+        scheduler = self.get_scheduler(args, cpus_per_task, args.mem / n_workers)
+        recorder = StateRecorder(args.logging_multijobid)
+        self.run_jobs(n_workers, task_ids, scheduler=scheduler, recorder=recorder,
+                      cache=ResultCache.from_environment(), forkserver=self.get_forkserver(args))
+
 
+    def get_log_paths(self, task_id):
+        if self.shard_dir is None:
+            return tuple(self.log_path + '_{}{}'.format(task_id, ext) for ext in LOG_EXTENSIONS)
+        shard = get_shard(task_id)
+        if shard not in self._shards:
+            os.makedirs(os.path.join(self.shard_dir, shard), exist_ok=True)
+            self._shards.add(shard)
+        return tuple(get_sharded_log_path(self.shard_dir, task_id, ext) for ext in LOG_EXTENSIONS)
 
-    def process_one_job(self, task_id):
-        run_command_by_id(
-            self.commands,
-            task_id,
-            stdout=self.log_path + '_{}.o'.format(task_id),
-            stderr=self.log_path + '_{}.e'.format(task_id),
-        )
+    def generate_tasks(self, task_ids):
+        for task_id in task_ids:
+            yield (task_id, self.commands[task_id], *self.get_log_paths(task_id))
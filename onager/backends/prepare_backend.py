@@ -1,12 +1,13 @@
-from . import local, gridengine, slurm
-
 def prepare_backend(args):
     if args.backend == 'local':
-        backend = local.LocalBackend()
+        from .local import LocalBackend
+        backend = LocalBackend()
     elif args.backend == 'gridengine':
-        backend = gridengine.GridEngineBackend()
+        from .gridengine import GridEngineBackend
+        backend = GridEngineBackend()
     elif args.backend == 'slurm':
-        backend = slurm.SlurmBackend()
+        from .slurm import SlurmBackend
+        backend = SlurmBackend()
     else:
         raise NotImplementedError('Invalid backend')
     return backend
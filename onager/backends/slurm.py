@@ -1,28 +1,57 @@
 from datetime import timedelta
+import math
 import os
 
 from ._backend import Backend
-from ..subjobsfilemanager import SubjobsFileManager
-from ..utils import compute_subjobs_filename, split_tasklist_into_subjob_groups
+from ..config import get_active_config
+from ..taskset import TaskSet
+
+# Slurm's default MaxArraySize; array indices must be strictly less than this
+DEFAULT_MAX_ARRAY_SIZE = 1001
+# Keep each --array spec well within the limits of the command line
+MAX_ARRAY_SPEC_LENGTH = 10000
+TASK_OFFSET_VAR = 'ONAGER_TASK_OFFSET'
+# Keep each scancel command well below the kernel's limit on the length of a single argument
+MAX_CANCEL_CMD_LENGTH = 32768
 
 class SlurmBackend(Backend):
     def __init__(self):
         super().__init__()
         self.name = 'slurm'
-        self.task_id_var = r'$SLURM_ARRAY_TASK_ID'
+        # Array indices are offset from the task ids when a job is split across several arrays
+        self.task_id_var = r'$((SLURM_ARRAY_TASK_ID + ${{{}:-0}}))'.format(TASK_OFFSET_VAR)
         self.job_id_var = r'$SLURM_ARRAY_JOB_ID'
 
     def get_cancel_cmds(self, cancellations):
+        """Return scancel commands using array range syntax (e.g. "scancel '123_[1-500,700-900]'")
+
+        The job id is quoted, so the shell doesn't expand the brackets as a glob. Each command is kept under MAX_CANCEL_CMD_LENGTH characters, so huge task lists are split
+        across several commands.
+        """
         cmds = []
         for cancellation in cancellations:
-            jobid, tasklist = cancellation
-            cmd = "scancel"
-            if tasklist is None:
-                cmd += " {}".format(jobid)
-            else:
-                for task_id in tasklist:
-                    cmd += " {}_{}".format(jobid, task_id)
-            cmds.append(cmd)
+            jobid, taskset = cancellation
+            if taskset is None:
+                cmds.append("scancel {}".format(jobid))
+                continue
+            # scancel doesn't accept stepped ranges, so those are listed one id at a time
+            blocks = []
+            for rng in taskset.ranges:
+                if rng.step == 1 and len(rng) > 1:
+                    blocks.append('{}-{}'.format(rng[0], rng[-1]))
+                else:
+                    blocks.extend(map(str, rng))
+            prefix, suffix = "scancel '{}_[".format(jobid), "]'"
+            chunk = []
+            chunk_length = len(prefix) + len(suffix)
+            for block in blocks:
+                if chunk and chunk_length + len(block) + 1 > MAX_CANCEL_CMD_LENGTH:
+                    cmds.append(prefix + ','.join(chunk) + suffix)
+                    chunk, chunk_length = [], len(prefix) + len(suffix)
+                chunk.append(block)
+                chunk_length += len(block) + 1
+            if chunk:
+                cmds.append(prefix + ','.join(chunk) + suffix)
         return cmds
 
     def get_job_list(self, args):
@@ -54,38 +83,75 @@ class SlurmBackend(Backend):
 
         # Logging
         log_dir = self.get_log_dir()
-        # Format is jobname_jobid_taskid.*
-        base_cmd += '-o {} '.format(os.path.join(log_dir, '%x_%A_%a.o'))  # save stdout to file
-        base_cmd += '-e {} '.format(os.path.join(log_dir, '%x_%A_%a.e'))  # save stderr to file
+        if args.shard_logs:
+            # The wrapper script redirects its own output to the sharded log files
+            base_cmd += '-o /dev/null -e /dev/null '
+        else:
+            # Format is jobname_jobid_taskid.*
+            base_cmd += '-o {} '.format(os.path.join(log_dir, '%x_%A_%a.o'))  # save stdout to file
+            base_cmd += '-e {} '.format(os.path.join(log_dir, '%x_%A_%a.e'))  # save stderr to file
 
         # The --parsable flag causes sbatch to print the jobid to stdout. We read the
         # jobid with subprocess.check_output()
         base_cmd += '--parsable '
 
         if args.tasks_per_node == 1:
-            base_cmd += "--array={}".format(args.tasklist)
+            array_ids = TaskSet.from_string(args.tasklist)
             wrapper_filename = 'wrapper.sh'
         elif args.tasks_per_node > 1:
-            list_of_tasklist_strings = split_tasklist_into_subjob_groups(args.tasklist, args.tasks_per_node)
-            subjobs_filename = compute_subjobs_filename(args.jobfile)
-            sfm = SubjobsFileManager(subjobs_filename)
-            subjob_groupids = sfm.add_subjobs(list_of_tasklist_strings)
-            tasklist = ','.join([str(id) for id in subjob_groupids])
-            base_cmd += "--array={}".format(tasklist)
+            subjob_groupids = self.add_subjob_groups(args)
+            array_ids = TaskSet.from_ids(subjob_groupids)
             wrapper_filename = 'multiwrapper.sh'
         else:
             raise RuntimeError('task_per_node must be >= 1')
+
+        array_suffix = ''
         if args.max_tasks > 0:
             # set maximum number of running tasks
-            base_cmd += '%{} '.format(args.max_tasks)
+            array_suffix += '%{} '.format(args.max_tasks)
         else:
-            base_cmd += ' '
+            array_suffix += ' '
 
         # Prevent Slurm from running this new job until the specified job ID is finished.
         if args.hold_jid is not None:
-            base_cmd += "--depend=afterany:{} ".format(args.hold_jid)
+            array_suffix += "--depend=afterany:{} ".format(args.hold_jid)
 
         wrapper_script = self.wrap_tasks(args.jobfile, args)
         wrapper_file = self.save_wrapper_script(wrapper_script, args.jobname, filename=wrapper_filename)
-        base_cmd += "{}".format(wrapper_file)
-        return [base_cmd]
+
+        # Submit one array job per chunk of ids, each shifted down by its offset so that
+        # the array indices stay below the cluster's MaxArraySize
+        jobs = []
+        self.job_arrays = []
+        for offset, array_indices in self.split_array(array_ids, self.get_max_array_size()):
+            cmd = base_cmd + "--array={}".format(array_indices) + array_suffix
+            if offset != 0:
+                cmd += "--export=ALL,{}={} ".format(TASK_OFFSET_VAR, offset)
+            cmd += "{}".format(wrapper_file)
+            jobs.append(cmd)
+            self.job_arrays.append((offset, array_indices.shift(offset)))
+        return jobs
+
+    def get_max_array_size(self):
+        config = get_active_config()
+        return int(config.get(self.name, 'max_array_size', fallback=DEFAULT_MAX_ARRAY_SIZE))
+
+    def split_array(self, array_ids, max_array_size):
+        """Yield (offset, array_indices) pairs that together cover array_ids
+
+        Each chunk's indices (id - offset) are less than max_array_size, and its array spec is
+        at most MAX_ARRAY_SPEC_LENGTH characters long. The offset is 0 whenever possible.
+        """
+        remaining = array_ids
+        while remaining:
+            first = remaining[0]
+            offset = 0 if first < max_array_size else first
+            window = remaining & TaskSet([range(offset, offset + max_array_size)])
+            remaining = remaining.slice(len(window), len(remaining))
+            array_indices = window.shift(-offset)
+            chunk_size = len(array_indices)
+            while chunk_size > 1 and any(len(str(chunk)) > MAX_ARRAY_SPEC_LENGTH
+                                         for chunk in array_indices.chunks(chunk_size)):
+                chunk_size = math.ceil(chunk_size / 2)
+            for chunk in array_indices.chunks(chunk_size):
+                yield offset, chunk
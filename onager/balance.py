@@ -0,0 +1,120 @@
+import heapq
+import math
+import os
+import shlex
+
+from .jobfile import Jobfile
+from .state import load_task_states, is_completed
+from .taskset import TaskSet
+from .utils import load_jobindex
+
+# Names available to --balance-weights expressions, besides the task's own arguments
+WEIGHT_BUILTINS = {'abs': abs, 'len': len, 'min': min, 'max': max, 'log': math.log,
+                   'sqrt': math.sqrt, 'int': int, 'float': float}
+
+def _parse_value(value):
+    for convert in (int, float):
+        try:
+            return convert(value)
+        except ValueError:
+            pass
+    return value
+
+def get_arg_values(cmd):
+    """Return a dict of the '--name value' args (and valueless flags) in a command
+
+    Names are converted to Python identifiers (e.g. '--batch-size 32' -> {'batch_size': 32}), and
+    values to numbers where possible. Positional args are collected under 'pos'.
+    """
+    values = {'pos': []}
+    tokens = shlex.split(cmd)
+    i = 1
+    while i < len(tokens):
+        token = tokens[i]
+        if token.startswith('-') and not isinstance(_parse_value(token), (int, float)):
+            name = token.lstrip('-').replace('-', '_')
+            if i + 1 < len(tokens) and not tokens[i + 1].startswith('--'):
+                values[name] = _parse_value(tokens[i + 1])
+                i += 1
+            else:
+                values[name] = True
+        else:
+            values['pos'].append(_parse_value(token))
+        i += 1
+    return values
+
+def get_expression_weights(jobfile, taskset, expression):
+    """Evaluate a Python expression on each task's arg values to estimate its cost"""
+    code = compile(expression, '--balance-weights', 'eval')
+    weights = {}
+    for task_id in taskset:
+        namespace = get_arg_values(jobfile[task_id])
+        namespace['task_id'] = task_id
+        try:
+            weights[task_id] = float(eval(code, {'__builtins__': WEIGHT_BUILTINS}, namespace))
+        except Exception as err:
+            raise ValueError('Unable to compute weight {!r} for task {} ({}): {}: {}'.format(
+                expression, task_id, jobfile[task_id], type(err).__name__, err)) from err
+    return weights
+
+def get_previous_durations(jobname):
+    """Return the mean duration of each tag (or command) across previous runs of a job"""
+    totals, counts = {}, {}
+    for jobid, entry in load_jobindex().items():
+        if entry.jobname != jobname or not os.path.exists(entry.jobfile):
+            continue
+        task_states = load_task_states(jobid)
+        if not task_states:
+            continue
+        jobfile = Jobfile(entry.jobfile)
+        for task_id, task_state in task_states.items():
+            if not is_completed(task_state) or task_state.start is None or task_id not in jobfile:
+                continue
+            cmd, tag = jobfile.get_record(task_id)
+            key = tag or cmd
+            totals[key] = totals.get(key, 0) + (task_state.end - task_state.start)
+            counts[key] = counts.get(key, 0) + 1
+        jobfile.close()
+    return {key: totals[key] / counts[key] for key in totals}
+
+def get_history_weights(jobfile, taskset, jobname):
+    """Estimate each task's cost from previous runs of the same tags (or commands)"""
+    durations = get_previous_durations(jobname)
+    # Tasks that have never run are assumed to take the average time
+    default = sum(durations.values()) / len(durations) if durations else 1.0
+    weights = {}
+    for task_id in taskset:
+        cmd, tag = jobfile.get_record(task_id)
+        weights[task_id] = durations.get(tag or cmd, default)
+    return weights
+
+def get_task_weights(args, taskset):
+    """Return the estimated cost of each task, or None if balancing wasn't requested"""
+    expression = getattr(args, 'balance_weights', None)
+    use_history = getattr(args, 'balance_history', False)
+    if expression is None and not use_history:
+        return None
+    jobfile = Jobfile(args.jobfile)
+    try:
+        if expression is not None:
+            return get_expression_weights(jobfile, taskset, expression)
+        return get_history_weights(jobfile, taskset, args.jobname)
+    finally:
+        jobfile.close()
+
+def pack_subjob_groups(taskset, tasks_per_node, weights):
+    """Pack tasks into groups of at most tasks_per_node, balancing the total weight of each group
+
+    Uses the longest-processing-time-first heuristic: tasks are assigned in order of decreasing
+    weight, each to the group with the smallest total weight that still has room. Returns a list
+    of tasklist strings, like split_tasklist_into_subjob_groups.
+    """
+    n_groups = math.ceil(len(taskset) / tasks_per_node)
+    groups = [[] for _ in range(n_groups)]
+    heap = [(0.0, group_index) for group_index in range(n_groups)]
+    for task_id in sorted(taskset, key=lambda task_id: (-weights[task_id], task_id)):
+        load, group_index = heapq.heappop(heap)
+        groups[group_index].append(task_id)
+        if len(groups[group_index]) < tasks_per_node:
+            heapq.heappush(heap, (load + weights[task_id], group_index))
+    return [str(TaskSet.from_ids(group)) for group in groups]
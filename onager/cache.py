@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+import time
+
+from .constants import default_cache_folder
+from .taskset import TaskSet
+
+# Launches with --cache pass their input fingerprint to workers on other hosts in this variable
+FINGERPRINT_VAR = 'ONAGER_CACHE_FINGERPRINT'
+
+def get_fingerprint(env_vars=(), paths=()):
+    """Hash the values of the declared environment variables and the mtimes/sizes of input files"""
+    inputs = {'env': {var: os.environ.get(var) for var in sorted(env_vars)}, 'files': {}}
+    for path in sorted(paths):
+        try:
+            stat = os.stat(path)
+            inputs['files'][path] = [stat.st_mtime_ns, stat.st_size]
+        except FileNotFoundError:
+            inputs['files'][path] = None
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode('utf-8')).hexdigest()
+
+class ResultCache:
+    """Content-addressed record of the commands that have already succeeded
+
+    Each entry is a small file, .onager/cache/<key[:2]>/<key>.json, where the key hashes the
+    exact command string, the working directory and the launch's input fingerprint. Looking up a
+    command therefore costs a single stat. Entries older than max_age seconds are ignored (and
+    removed) when looked up.
+    """
+    def __init__(self, fingerprint='', max_age=None, cache_dir=default_cache_folder):
+        self.fingerprint = fingerprint
+        self.max_age = max_age
+        self.cache_dir = cache_dir
+        self.cwd = os.getcwd()
+
+    @classmethod
+    def from_environment(cls):
+        """Return the cache for a worker whose job was launched with --cache, or None"""
+        fingerprint = os.environ.get(FINGERPRINT_VAR)
+        return cls(fingerprint) if fingerprint is not None else None
+
+    def get_key(self, cmd):
+        key = json.dumps([cmd, self.cwd, self.fingerprint])
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def get_entry_path(self, cmd):
+        key = self.get_key(cmd)
+        return os.path.join(self.cache_dir, key[:2], key + '.json')
+
+    def __contains__(self, cmd):
+        entry_path = self.get_entry_path(cmd)
+        try:
+            age = time.time() - os.stat(entry_path).st_mtime
+        except FileNotFoundError:
+            return False
+        if self.max_age is not None and age > self.max_age:
+            try:
+                os.remove(entry_path)
+            except FileNotFoundError:
+                pass
+            return False
+        return True
+
+    def add(self, cmd, jobid=None, task_id=None):
+        """Record that cmd succeeded"""
+        entry_path = self.get_entry_path(cmd)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        entry = {'command': cmd, 'cwd': self.cwd, 'time': time.time(), 'jobid': jobid,
+                 'task_id': task_id}
+        # Write to a temporary file first, so concurrent readers never see a partial entry
+        tmp_path = '{}.{}.tmp'.format(entry_path, os.getpid())
+        with open(tmp_path, 'w') as file:
+            json.dump(entry, file)
+        os.replace(tmp_path, entry_path)
+
+    def filter_taskset(self, commands, taskset):
+        """Return the tasks in taskset whose commands have not already succeeded"""
+        return TaskSet.from_ids(task_id for task_id in taskset if commands[task_id] not in self)
+
+def prepare_cache(args, commands):
+    """Set up the result cache for a launch with --cache, and remove cached tasks from its tasklist
+
+    Returns False if every task has already succeeded.
+    """
+    args.cache_fingerprint = get_fingerprint(args.cache_env or (), args.cache_files or ())
+    max_age = args.cache_expiry * 24 * 60 * 60 if args.cache_expiry is not None else None
+    cache = ResultCache(args.cache_fingerprint, max_age)
+    taskset = TaskSet.from_string(args.tasklist)
+    remaining = cache.filter_taskset(commands, taskset)
+    n_cached = len(taskset) - len(remaining)
+    if n_cached > 0:
+        print('Skipping {} of {} tasks whose commands already succeeded'.format(
+            n_cached, len(taskset)))
+    args.tasklist = str(remaining)
+    return bool(remaining)
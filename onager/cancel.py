@@ -1,19 +1,28 @@
-import subprocess
 import sys
 
 from .backends import prepare_backend
-from .list import get_job_listings
+from .list import get_job_tasksets
+from .submit import submit_commands
 
-def launch_cancel_proc(cmd, args):
-    """Print the cancel command and launch a subprocess to execute it"""
+# Maximum number of cancel commands to run at once
+MAX_CANCEL_WORKERS = 8
+
+def launch_cancel_procs(cmds, args):
+    """Print the cancel commands and run them concurrently"""
     if not args.quiet:
-        print(cmd)
-    if not args.dry_run:
-        try:
-            subprocess.call(cmd, shell=True)
-        except (subprocess.CalledProcessError, ValueError) as err:
-            print(err)
-            sys.exit()
+        for cmd in cmds:
+            print(cmd)
+    if args.dry_run:
+        return
+    results = submit_commands(cmds, max_workers=MAX_CANCEL_WORKERS)
+    errors = [result for result in results if result.error is not None]
+    for result in results:
+        if result.error is None:
+            sys.stdout.write(result.output)
+        else:
+            print('Cancellation failed: {}\n{}'.format(result.cmd, result.error))
+    if errors:
+        sys.exit(1)
 
 def cancel(args):
     """Parse the jobs/tasks to cancel and send the appropriate commands to the cluster"""
@@ -27,17 +36,19 @@ def cancel(args):
             print('Job cancellation aborted.')
             sys.exit()
 
-    job_list = get_job_listings(args)
-    unique_job_ids = sorted(list(set([listing.job_id for listing in job_list])))
-
-    tasklists = {job_id: [] for job_id in unique_job_ids}
-    for listing in job_list:
-        tasklists[listing.job_id].append(listing.task_id)
-
-    cancellations = [(job_id, tasklists[job_id]) for job_id in unique_job_ids]
+    cancellations = []
+    for job_id, entry, _, job_taskset in get_job_tasksets(args):
+        if not job_taskset:
+            continue
+        if args.tasklist is None:
+            # Cancel the whole job with a single command
+            job_taskset = None
+        elif entry.task_offset:
+            # Convert task ids back to the array indices they were submitted with
+            job_taskset = job_taskset.shift(-int(entry.task_offset))
+        cancellations.append((job_id, job_taskset))
+    cancellations.sort(key=lambda cancellation: cancellation[0])
 
     backend = prepare_backend(args)
     cmds = backend.get_cancel_cmds(cancellations)
-    
-    for cmd in cmds:
-        launch_cancel_proc(cmd, args)
+    launch_cancel_procs(cmds, args)
@@ -4,9 +4,14 @@ import os
 onager_folder = '.onager'
 default_scripts_folder = os.path.join(onager_folder, 'scripts')
 default_logs_folder = os.path.join(onager_folder, 'logs')
+default_state_folder = os.path.join(onager_folder, 'state')
+default_cache_folder = os.path.join(onager_folder, 'cache')
+# Shared by every user's local launches on the host
+host_slots_folder = os.path.join('/tmp', 'onager-slots')
 job_index = os.path.join(onager_folder, 'job_index.csv') # id,jobname,jobfile_path
 history_index = os.path.join(onager_folder, 'history_index.csv')
-defaultjobfile = os.path.join(default_scripts_folder, '{jobname}', 'jobs.json')
+defaultjobfile = os.path.join(default_scripts_folder, '{jobname}', 'jobs.jsonl')
+legacy_defaultjobfile = os.path.join(default_scripts_folder, '{jobname}', 'jobs.json')
 globalconfigfile = os.path.join(os.path.expanduser('~'), '.onagerconfig')
 localconfigfile = os.path.join(onager_folder, 'config')
 
@@ -0,0 +1,123 @@
+import asyncio
+from contextlib import ExitStack
+from datetime import datetime
+import subprocess
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from .resources import wait_for_process_async
+
+# Each running task holds open its two log files, plus a few descriptors for the child process
+FDS_PER_TASK = 4
+
+def raise_open_file_limit(max_concurrency):
+    """Raise the soft limit on open files, if necessary, so that many tasks can run at once"""
+    if resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    needed = FDS_PER_TASK * max_concurrency + 64
+    if soft != resource.RLIM_INFINITY and soft < needed:
+        new_soft = needed if hard == resource.RLIM_INFINITY else min(needed, hard)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (new_soft, hard))
+
+async def run_task(task, quiet=False, preexec_fn=None, forkserver=None):
+    """Run a single (task_id, command, stdout_path, stderr_path) task
+
+    If a ForkServer is provided, the command is a 'module:function arg ...' entry point to call in
+    a process forked from it, rather than a shell command. Returns the task's exit code and
+    resource usage.
+    """
+    _, cmd, stdout, stderr = task
+    if not quiet:
+        print('Launching worker: {}'.format(cmd), flush=True)
+        start_time = datetime.now()
+    if forkserver is not None:
+        returncode, usage = await forkserver.run(cmd, stdout, stderr, preexec_fn)
+        if not quiet:
+            elapsed = datetime.now() - start_time
+            print('Worker finished: {}\nElapsed time:  {}'.format(cmd, elapsed), flush=True)
+        return returncode, usage
+    with ExitStack() as stack:
+        stdout = stack.enter_context(open(stdout, 'wb')) if stdout is not None else None
+        stderr = stack.enter_context(open(stderr, 'wb')) if stderr is not None else None
+        # The process is reaped with os.wait4 (rather than asyncio's child watcher) to get its rusage
+        proc = subprocess.Popen(cmd, shell=True, stdout=stdout, stderr=stderr,
+                                preexec_fn=preexec_fn)
+    try:
+        returncode, usage = await wait_for_process_async(proc)
+    except BaseException:
+        if proc.returncode is None:
+            proc.kill()
+            proc.wait()
+        raise
+    if not quiet:
+        elapsed = datetime.now() - start_time
+        print('Worker finished: {}\nElapsed time:  {}'.format(cmd, elapsed), flush=True)
+    return returncode, usage
+
+async def _run_tasks(tasks, max_concurrency, quiet, scheduler, recorder, cache, forkserver):
+    semaphore = asyncio.Semaphore(max_concurrency)
+    running = set()
+    failed = []
+    returncodes = {}
+
+    async def run_and_release(task, allocation):
+        task_id = task[0]
+        start = recorder.record_running(task_id) if recorder is not None else None
+        usage = None
+        try:
+            preexec_fn = scheduler.get_preexec_fn(allocation) if scheduler else None
+            returncodes[task_id], usage = await run_task(task, quiet=quiet, preexec_fn=preexec_fn,
+                                                         forkserver=forkserver)
+            if cache is not None and returncodes[task_id] == 0:
+                cache.add(task[1], recorder.jobid if recorder is not None else None, task_id)
+        finally:
+            if recorder is not None:
+                recorder.record_finished(task_id, returncodes.get(task_id), start, usage)
+            if scheduler is not None:
+                await scheduler.release(allocation)
+            semaphore.release()
+
+    def on_done(future):
+        running.discard(future)
+        if not future.cancelled() and future.exception() is not None:
+            failed.append(future)
+
+    # Only pull the next task once a slot is free, so tasks can be generated lazily (and so tasks
+    # claimed from a shared queue never wait behind a running task)
+    tasks = iter(tasks)
+    # Stop starting tasks once one fails to run (e.g. if its log file can't be opened)
+    while not failed:
+        await semaphore.acquire()
+        allocation = await scheduler.acquire() if scheduler is not None else None
+        task = next(tasks, None)
+        if task is None:
+            if scheduler is not None:
+                await scheduler.release(allocation)
+            break
+        future = asyncio.ensure_future(run_and_release(task, allocation))
+        running.add(future)
+        future.add_done_callback(on_done)
+    if running:
+        await asyncio.gather(*running, return_exceptions=True)
+    if failed:
+        raise failed[0].exception()
+    return returncodes
+
+def run_tasks(tasks, max_concurrency, quiet=False, scheduler=None, recorder=None, cache=None,
+              forkserver=None):
+    """Run tasks as subprocesses from a single event loop, with at most max_concurrency at once
+
+    If a ResourceScheduler is provided, each task also waits for its CPU/memory allocation, if
+    a StateRecorder is provided, each task's state transitions are recorded, and if a ResultCache
+    is provided, the commands of successful tasks are added to it. If a ForkServer is provided,
+    tasks are entry points forked from it (see run_task).
+    Returns a dictionary mapping each task_id to its exit code. If a task can't be run, no more
+    tasks are started, and its exception is raised once the running tasks have finished.
+    """
+    raise_open_file_limit(max_concurrency)
+    return asyncio.run(_run_tasks(tasks, max_concurrency, quiet, scheduler, recorder, cache,
+                                  forkserver))
@@ -0,0 +1,112 @@
+import asyncio
+import importlib
+import multiprocessing
+import os
+import shlex
+import sys
+import traceback
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from .resources import get_usage
+
+def parse_entry_point(cmd):
+    """Split a 'module:function arg ...' command into its module name, function name and argv"""
+    argv = shlex.split(cmd)
+    module_name, _, function_name = argv[0].partition(':') if argv else ('', '', '')
+    if not module_name or not function_name:
+        raise ValueError("Expected a 'module:function [args...]' command: {}".format(cmd))
+    return module_name, function_name, argv
+
+def _redirect(path, fd):
+    # Redirect the file descriptor itself, so output from C extensions and subprocesses is logged
+    log_fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    os.dup2(log_fd, fd)
+    os.close(log_fd)
+
+def run_entry_point(cmd, stdout, stderr, preexec_fn, usage_conn):
+    """Call the entry point of a 'module:function arg ...' command, in a process forked from the
+    fork server, and exit with its status
+
+    As with console_scripts entry points, the function is called without arguments, with sys.argv
+    set to the command's argv, and its return value (or SystemExit code) is the exit status.
+    """
+    if stdout is not None:
+        _redirect(stdout, 1)
+    if stderr is not None:
+        _redirect(stderr, 2)
+    returncode = 1
+    try:
+        if preexec_fn is not None:
+            preexec_fn()
+        module_name, function_name, argv = parse_entry_point(cmd)
+        # Import modules from the working directory, as 'python -m' would
+        if os.getcwd() not in sys.path:
+            sys.path.insert(0, os.getcwd())
+        sys.argv = argv
+        function = getattr(importlib.import_module(module_name), function_name)
+        result = function()
+        returncode = result if isinstance(result, int) else 0
+    except SystemExit as exit:
+        if exit.code is None or isinstance(exit.code, int):
+            returncode = exit.code or 0
+        else:
+            print(exit.code, file=sys.stderr)
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        if resource is not None:
+            # A forked process starts with zeroed resource usage, so this only counts the task
+            usage_conn.send(get_usage(resource.getrusage(resource.RUSAGE_SELF)))
+        usage_conn.close()
+    sys.exit(returncode)
+
+class ForkServer:
+    """Runs 'module:function arg ...' commands in processes forked from a fork server
+
+    The fork server is started once, with the preload modules already imported, so each task
+    starts in milliseconds rather than paying for its imports again.
+    """
+    def __init__(self, preload=()):
+        self.context = multiprocessing.get_context('forkserver')
+        # Let the fork server import preload modules from the working directory, like the tasks
+        if os.getcwd() not in sys.path:
+            sys.path.insert(0, os.getcwd())
+        # multiprocessing re-runs the main module (bin/onager, or onager.multiworker) in each
+        # task, so preload it, and the onager modules it imported, to make that hit the import
+        # cache. (Some Python versions never preload '__main__' itself, so its imports are listed.)
+        main_imports = sorted(name for name in sys.modules
+                              if name == 'onager' or name.startswith('onager.'))
+        self.context.set_forkserver_preload(['__main__'] + main_imports + list(preload))
+
+    async def run(self, cmd, stdout=None, stderr=None, preexec_fn=None):
+        """Run a command in a new forked process, and return its exit code and resource usage"""
+        receiver, sender = self.context.Pipe(duplex=False)
+        proc = self.context.Process(target=run_entry_point,
+                                    args=(cmd, stdout, stderr, preexec_fn, sender))
+        proc.start()
+        sender.close()
+        try:
+            # The process's sentinel becomes readable when it exits
+            loop = asyncio.get_running_loop()
+            exited = loop.create_future()
+            loop.add_reader(proc.sentinel, lambda: exited.done() or exited.set_result(None))
+            try:
+                await exited
+            finally:
+                loop.remove_reader(proc.sentinel)
+        except BaseException:
+            proc.kill()
+            raise
+        finally:
+            proc.join()
+        usage = receiver.recv() if receiver.poll() else None
+        receiver.close()
+        returncode = proc.exitcode
+        proc.close()
+        return returncode, usage
@@ -35,6 +35,8 @@ def parse_args(args=None):
         help='Specifies which args go into the unique <tag-contents>. Default is all provided args')
     prelaunch_parser.add_argument('+no-tag-number', action='store_true', dest='no_tag_number',
         help='Disable auto-numbering when generating tags')
+    prelaunch_parser.add_argument('+compact', action='store_true',
+        help='Store the argument lists instead of every generated command, and rebuild each command on demand')
     prelaunch_parser.add_argument('+a', '+append', action='store_true', dest='append',
         help='Add more jobs to existing jobfile')
     prelaunch_parser.add_argument('+q', '+quiet', action='store_true', dest='quiet',
@@ -44,8 +46,8 @@ def parse_args(args=None):
     launch_parser = subparsers.add_parser('launch', help='Launch jobs using the specified backend')
     launch_parser.add_argument('--backend', choices=backends.__all__, required=True,
         help='The backend to use for launching jobs')
-    launch_parser.add_argument('--jobname', type=str, required=True,
-        help='A name for the job')
+    launch_parser.add_argument('--jobname', type=str, default=None,
+        help='A name for the job (required unless resuming)')
     launch_parser.add_argument('--command', type=str, default=None,
         help='Launch a single command instead of using a jobfile')
     launch_parser.add_argument('--jobfile', type=str, default=constants.defaultjobfile,
@@ -68,12 +70,58 @@ def parse_args(args=None):
         help='How many total tasks to process with each node')
     launch_parser.add_argument('--max-tasks-per-node', type=int, default=-1,
         help='Maximum number of simultaneous tasks to process with each node')
+    launch_parser.add_argument('--balance-weights', type=str, default=None, metavar='EXPR',
+        help='Balance the groups of tasks per node by a cost estimate for each task, computed '
+        'from its args with a Python expression (e.g. "batch_size * n_layers")')
+    launch_parser.add_argument('--balance-history', action='store_true',
+        help='Balance the groups of tasks per node using the durations of previous runs of the '
+        'same tags')
+    launch_parser.add_argument('--work-queue', action='store_true',
+        help='Have every node pull tasks from a shared queue, instead of running a fixed group')
+    launch_parser.add_argument('--pin-cpus', action='store_true',
+        help='Pin each locally-run task to its own set of --cpus cores')
+    launch_parser.add_argument('--mem-admission', action='store_true',
+        help='Only start locally-run tasks when their --mem budget fits in available memory')
+    launch_parser.add_argument('--mem-limit', action='store_true',
+        help='Limit the address space of each locally-run task to its --mem budget')
+    launch_parser.add_argument('--host-slots', action='store_true',
+        help='Queue locally-run tasks for CPU (and, with --mem-admission, memory) slots shared '
+             'with every other --host-slots launch on the host')
+    launch_parser.add_argument('--wrapper', choices=['python', 'native'], default='python',
+        help="How wrapper scripts run each task: 'python' runs onager.worker, which records task "
+             "states; 'native' looks up the command with shell tools and execs it directly")
+    launch_parser.add_argument('--forkserver', action='store_true',
+        help="Treat commands as 'module:function args...' entry points, and call them in "
+             "processes forked from a fork server (local backend, or --tasks-per-node > 1)")
+    launch_parser.add_argument('--preload', type=str, nargs='+', default=None, metavar='MODULE',
+        help='With --forkserver, modules to import once per node, before forking any tasks')
+    launch_parser.add_argument('--shard-logs', action='store_true',
+        help='Shard log files into subdirectories by task id, to keep directories small')
+    launch_parser.add_argument('--cache', action='store_true',
+        help='Skip tasks whose exact command already succeeded in this directory, and record the '
+             'commands that succeed')
+    launch_parser.add_argument('--cache-env', type=str, nargs='+', default=None, metavar='VAR',
+        help='With --cache, also key cached results by the values of these environment variables')
+    launch_parser.add_argument('--cache-files', type=str, nargs='+', default=None, metavar='PATH',
+        help='With --cache, also key cached results by the modification times of these files')
+    launch_parser.add_argument('--cache-expiry', type=float, default=None, metavar='DAYS',
+        help='With --cache, ignore cached results older than this many days')
+    launch_parser.add_argument('--resume', type=str, default=None, metavar='JOBID',
+        help='Relaunch only the unfinished or failed tasks of a previously launched job')
+    launch_parser.add_argument('--retry-failed', type=int, default=None, metavar='N',
+        help='When resuming, skip tasks that have already failed more than N times')
     launch_parser.add_argument('--debug', '--test', action='store_true', dest='debug',
         help="Submit a short-duration, high-priority job to the backend")
     launch_parser.set_defaults(debug=False)
     launch_parser.add_argument('-d','--dry-run', action='store_true',
         help="Don't actually submit jobs to backend")
     launch_parser.set_defaults(dry_run=False)
+    launch_parser.add_argument('--submit-workers', type=int, default=4,
+        help='Maximum number of submission commands (sbatch/qsub) to run at once')
+    launch_parser.add_argument('--submit-rate', type=float, default=10,
+        help='Maximum number of submission commands to start per second (0 for no limit)')
+    launch_parser.add_argument('--submit-retries', type=int, default=3,
+        help='Number of times to retry a submission after a transient scheduler error')
     launch_parser.add_argument('--hold_jid', type=str, default=None,
         help='Hold job until the specified jobid or jobid_taskid has finished')
 
@@ -102,6 +150,51 @@ def parse_args(args=None):
         help='Comma separated list of task IDs (e.g. "18-22:1,26,29,34-49:1")')
     list_parser.add_argument('--hide', type=str, nargs='+', default=None,
         help='Hide the specified columns')
+    list_parser.add_argument('--limit', type=int, default=None,
+        help='Show at most this many tasks')
+    list_parser.add_argument('--offset', type=int, default=0,
+        help='Skip this many tasks before listing')
+    list_parser.add_argument('--format', type=str, default='table', choices=['table', 'csv', 'jsonl'],
+        help='Output format (csv and jsonl are streamed as they are read)')
+
+
+    status_parser = subparsers.add_parser('status',
+        help='Summarize the recorded task states for a previously launched job')
+    status_parser.add_argument('-j','--jobid', type=str, default=None,
+        help='The job ID to show the status of')
+    status_parser.add_argument('--limit', type=int, default=None,
+        help='List at most this many failed tasks')
+    status_parser.add_argument('--host', action='store_true',
+        help='Show the host-wide slot usage and queue of --host-slots launches')
+
+
+    stats_parser = subparsers.add_parser('stats',
+        help='Summarize the resource usage of a previously launched job')
+    stats_parser.add_argument('-j','--jobid', type=str, required=True,
+        help='The job ID to show resource usage for')
+
+
+    logs_parser = subparsers.add_parser('logs',
+        help="Show, search or pack the log files of a previously launched job")
+    logs_parser.add_argument('action', nargs='?', choices=['show', 'pack'], default='show',
+        help="'show': print the logs of the selected tasks; "
+             "'pack': bundle the job's log files into a single indexed log pack")
+    logs_parser.add_argument('-j','--jobid', type=str, nargs='+', required=True,
+        help='The job ID(s) whose logs to use')
+    logs_parser.add_argument('-t','--tasklist', type=str, default=None,
+        help='Comma separated list of task IDs (e.g. "18-22:1,26,29,34-49:1")')
+    logs_parser.add_argument('--stream', choices=['stdout', 'stderr', 'both'], default='both',
+        help='Which logs to show')
+    logs_parser.add_argument('--tail', type=int, default=None, metavar='N',
+        help='Show only the last N lines of each log')
+    logs_parser.add_argument('--grep', type=str, default=None, metavar='PATTERN',
+        help='Show only the lines matching this regular expression, prefixed by their task ID')
+    logs_parser.add_argument('--workers', type=int, default=None,
+        help='Number of processes to search logs with (defaults to the number of CPUs)')
+    logs_parser.add_argument('--compress-threshold', type=int, default=65536, metavar='BYTES',
+        help='Compress logs larger than this many bytes when packing (-1 to never compress)')
+    logs_parser.add_argument('--keep', action='store_true',
+        help='Keep the original log files after packing them')
 
 
     cancel_parser = subparsers.add_parser('cancel',
@@ -137,7 +230,8 @@ def parse_args(args=None):
     help_parser = subparsers.add_parser('help',
         help='Show usage information for a subcommand')
     help_parser.add_argument('help_command', type=str, nargs='?',
-        choices=['prelaunch', 'launch', 'history', 'list', 'cancel', 'config', 'help'],
+        choices=['prelaunch', 'launch', 'history', 'list', 'status', 'stats', 'logs', 'cancel',
+                 'config', 'help'],
         help='Get help about a subcommand')
     # yapf: enable
 
@@ -4,10 +4,10 @@ from shutil import get_terminal_size
 import sys
 from textwrap import TextWrapper
 
-from tabulate import tabulate
+from tabulate import tabulate, MIN_PADDING
 
 from .constants import history_index
-from .utils import load_index, update_index, get_next_index_id
+from .utils import load_recent_index_entries, update_index
 
 HistoryEntry = namedtuple('HistoryEntry',
                           ['id', 'date', 'time', 'jobname', 'mode', 'dry_run', 'args'])
@@ -36,7 +36,7 @@ def add_new_history_entry(jobname, dry_run):
     now = datetime.now()
     cmd_args = [quoted(arg) for arg in sys.argv[2:]]
     history_entry = HistoryEntry(
-        id=get_next_index_id(history_index),
+        id=None, # assigned by update_index
         date=now.strftime('%Y.%m.%d'),
         time=now.strftime('%H:%M:%S.%f'),
         jobname=jobname,
@@ -49,7 +49,7 @@ def add_new_history_entry(jobname, dry_run):
 
 def get_history_tuple(entry: HistoryEntry) -> str:
     return (
-        str(entry.id),
+        str(entry.id) if entry.id is not None else None,
         entry.date,
         entry.time,
         entry.jobname,
@@ -58,10 +58,20 @@ def get_history_tuple(entry: HistoryEntry) -> str:
         entry.args,
     )
 
+def get_since(args):
+    """Return the (date, time) after which to show entries, formatted like the history index"""
+    if args.since is None:
+        return None
+    assert len(args.since) <= 2
+    date_str, time_str, *_ = args.since + ['00:00:00'] # use midnight if no time specified
+    since_datetime = datetime.strptime(date_str+' '+time_str, '%Y.%m.%d %H:%M:%S')
+    return (since_datetime.strftime('%Y.%m.%d'), since_datetime.strftime('%H:%M:%S.%f'))
+
 def get_history(args):
+    """Load the most recent args.n history entries (or all of them) after args.since"""
     history_list = []
     try:
-        index = load_index(history_index)
+        index = load_recent_index_entries(history_index, args.n or None, get_since(args))
     except (IOError):
         return history_list
     for cmd_id, cmd_details in index.items():
@@ -87,22 +97,12 @@ def check_mode_valid(entry, args):
     matches_prelaunch = (entry.mode == 'prelaunch') and args.prelaunch
     return no_mode_specified or matches_launch or matches_prelaunch
 
-def check_datetime_matches(entry, args):
-    if args.since is None:
-        return True
-    assert len(args.since) <= 2
-    date_str, time_str, *_ = args.since + ['00:00:00'] # use midnight if no time specified
-    format_str = '%Y.%m.%d %H:%M:%S'
-    since_datetime = datetime.strptime(date_str+' '+time_str, format_str)
-    entry_datetime = datetime.strptime(entry.date+' '+entry.time, format_str+'.%f')
-    return entry_datetime > since_datetime
-
 def should_print(entry, args):
+    # Entries before args.since are already skipped by get_history()
     matches_details = check_details_match(entry, args)
     valid_mode = check_mode_valid(entry, args)
-    matches_datetime = check_datetime_matches(entry, args)
     filtered = (entry.dry_run and args.no_dry_run)
-    return matches_details and valid_mode and matches_datetime and not filtered
+    return matches_details and valid_mode and not filtered
 
 def make_printable(entry, skip_cmd=False, wrap_cmd=False, cmd_width=None):
     result = [str(entry.id), entry.date, entry.time[:-3], entry.jobname, entry.mode]
@@ -121,9 +121,13 @@ def make_printable(entry, skip_cmd=False, wrap_cmd=False, cmd_width=None):
     return tuple(result)
 
 def compute_command_width(filtered_history, fields, args):
-
-    full_table_str = tabulate([make_printable(entry) for entry in filtered_history], headers=fields)
-    full_width = len(full_table_str.split('\n')[1])
+    # Measure the table in one pass over the rows, rather than rendering it. Like tabulate, each
+    # column is as wide as its widest cell, or its header plus padding, with 2 spaces in between
+    column_widths = [len(field) + MIN_PADDING for field in fields]
+    for entry in filtered_history:
+        for i, cell in enumerate(make_printable(entry)[:len(fields)]):
+            column_widths[i] = max(column_widths[i], len(cell))
+    full_width = sum(column_widths) + 2 * (len(fields) - 1)
     full_command_width = max([0]+[len(entry.args) for entry in filtered_history])
     base_width = full_width - full_command_width
     min_width = base_width + len('args__')
@@ -143,8 +147,7 @@ def print_history(args):
     if args.details == '-1' and history_entries:
         args.details = history_entries[-1].id
 
-    N = args.n or len(history_entries)
-    filtered_history = [entry for entry in history_entries[-N:] if should_print(entry, args)]
+    filtered_history = [entry for entry in history_entries if should_print(entry, args)]
 
     show_details = (args.details is not None)
     if show_details and (len(filtered_history) > 1):
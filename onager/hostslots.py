@@ -0,0 +1,210 @@
+import asyncio
+from collections import namedtuple
+import json
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from .constants import host_slots_folder
+from .resources import get_allowed_cpus, read_meminfo, GB
+
+CPU_SLOTS_FILE = 'cpus'
+MEM_SLOTS_FILE = 'mem'
+QUEUE_FOLDER = 'queue'
+POLL_INTERVAL = 0.2
+
+HostAllocation = namedtuple('HostAllocation', ['cpus', 'mem_slots'])
+Ticket = namedtuple('Ticket', ['name', 'time', 'pid', 'label', 'cpus', 'mem'])
+
+def _make_shared_dir(path):
+    os.makedirs(path, exist_ok=True)
+    try:
+        # Let every user on the host add files, but only remove their own (like /tmp itself)
+        os.chmod(path, 0o1777)
+    except PermissionError:
+        pass
+
+def _open_shared(path):
+    """Open (creating if necessary) a lock file that every user on the host can lock"""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+    try:
+        os.fchmod(fd, 0o666)
+    except PermissionError:
+        pass
+    return fd
+
+def _try_lock(fd, index, exclusive=True):
+    try:
+        fcntl.lockf(fd, (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | fcntl.LOCK_NB, 1, index)
+        return True
+    except OSError:
+        return False
+
+def _unlock(fd, index):
+    fcntl.lockf(fd, fcntl.LOCK_UN, 1, index)
+
+class HostSlots:
+    """CPU and memory slots shared by every --host-slots launch and multiworker on the host
+
+    Each slot is a byte of a lock file in /tmp/onager-slots: CPU slot i (in 'cpus') is core i,
+    and memory slot i (in 'mem') is 1 GB. Slots are held with POSIX record locks, so they are
+    released automatically when their holder exits. Record locks belong to the process (rather
+    than the file descriptor), so each process should have a single HostSlots, which keeps track
+    of the slots it holds itself.
+
+    Processes waiting for slots take tickets in 'queue/', and only the process with the oldest
+    live ticket may take free slots, so launches are served in order of arrival, rather than by
+    whichever polls first. Each ticket is locked by its holder, so the tickets of processes that
+    exited are recognized (and removed) by the others.
+    """
+    def __init__(self, label=None, slots_dir=host_slots_folder, poll_interval=POLL_INTERVAL):
+        if fcntl is None:
+            raise ValueError('Host slots require POSIX record locks (fcntl)')
+        self.label = label
+        self.slots_dir = slots_dir
+        self.queue_dir = os.path.join(slots_dir, QUEUE_FOLDER)
+        self.poll_interval = poll_interval
+        _make_shared_dir(self.slots_dir)
+        _make_shared_dir(self.queue_dir)
+        self.cpu_fd = _open_shared(os.path.join(slots_dir, CPU_SLOTS_FILE))
+        self.mem_fd = _open_shared(os.path.join(slots_dir, MEM_SLOTS_FILE))
+        self.cpus = get_allowed_cpus()
+        self.n_mem_slots = (read_meminfo('MemTotal') or 0) // GB
+        self.held_cpus = set()
+        self.held_mem_slots = set()
+        self.ticket = None
+        self._lock = None
+
+    def close(self):
+        os.close(self.cpu_fd)
+        os.close(self.mem_fd)
+
+    def _lock_free_slots(self, fd, candidates, held, n):
+        locked = []
+        for index in candidates:
+            if len(locked) == n:
+                break
+            if index not in held and _try_lock(fd, index):
+                locked.append(index)
+        return locked
+
+    def try_acquire(self, n_cpus, n_mem_slots=0):
+        """Take n_cpus CPU slots and n_mem_slots memory slots if they are all free, or return None
+
+        Requests are capped at the size of the host, so oversized tasks still run (one at a time).
+        """
+        n_cpus = min(n_cpus, len(self.cpus))
+        n_mem_slots = min(n_mem_slots, self.n_mem_slots)
+        cpus = self._lock_free_slots(self.cpu_fd, self.cpus, self.held_cpus, n_cpus)
+        mem_slots = self._lock_free_slots(self.mem_fd, range(self.n_mem_slots),
+                                          self.held_mem_slots, n_mem_slots)
+        if len(cpus) < n_cpus or len(mem_slots) < n_mem_slots:
+            for index in cpus:
+                _unlock(self.cpu_fd, index)
+            for index in mem_slots:
+                _unlock(self.mem_fd, index)
+            return None
+        self.held_cpus.update(cpus)
+        self.held_mem_slots.update(mem_slots)
+        return HostAllocation(cpus, mem_slots)
+
+    def release(self, allocation):
+        for index in allocation.cpus:
+            _unlock(self.cpu_fd, index)
+            self.held_cpus.discard(index)
+        for index in allocation.mem_slots:
+            _unlock(self.mem_fd, index)
+            self.held_mem_slots.discard(index)
+
+    async def acquire(self, n_cpus, n_mem_slots=0):
+        """Wait in the host-wide queue until the requested slots are free, and take them
+
+        Concurrent calls from the same process wait for each other (in order), since the process
+        holds at most one ticket at a time.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not self.get_queue():
+                allocation = self.try_acquire(n_cpus, n_mem_slots)
+                if allocation is not None:
+                    return allocation
+            self.take_ticket(n_cpus, n_mem_slots)
+            try:
+                while True:
+                    queue = self.get_queue()
+                    if queue and queue[0].name == self.ticket[0]:
+                        allocation = self.try_acquire(n_cpus, n_mem_slots)
+                        if allocation is not None:
+                            return allocation
+                    await asyncio.sleep(self.poll_interval)
+            finally:
+                self.return_ticket()
+
+    def take_ticket(self, n_cpus, n_mem_slots):
+        name = '{:020d}-{}'.format(time.time_ns(), os.getpid())
+        tmp_path = os.path.join(self.queue_dir, '.' + name)
+        fd = os.open(tmp_path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o644)
+        fcntl.lockf(fd, fcntl.LOCK_EX)
+        info = {'label': self.label, 'cpus': n_cpus, 'mem': n_mem_slots}
+        os.write(fd, json.dumps(info).encode('utf-8'))
+        # The ticket is locked before it joins the queue, so it is never mistaken for a stale one
+        path = os.path.join(self.queue_dir, name)
+        os.rename(tmp_path, path)
+        self.ticket = (name, path, fd, info)
+
+    def return_ticket(self):
+        name, path, fd, _ = self.ticket
+        os.remove(path)
+        os.close(fd)
+        self.ticket = None
+
+    def get_queue(self):
+        """Return the live tickets, oldest first, removing any left behind by exited processes"""
+        queue = []
+        for name in sorted(os.listdir(self.queue_dir)):
+            if name.startswith('.'):
+                continue
+            path = os.path.join(self.queue_dir, name)
+            if self.ticket is not None and name == self.ticket[0]:
+                # Don't test our own ticket: closing another descriptor would drop its lock
+                info = self.ticket[3]
+            else:
+                try:
+                    fd = os.open(path, os.O_RDONLY)
+                except FileNotFoundError:
+                    continue
+                try:
+                    if _try_lock(fd, 0, exclusive=False):
+                        try:
+                            os.remove(path)
+                        except OSError:
+                            pass
+                        continue
+                    info = json.loads(os.read(fd, 4096).decode('utf-8') or '{}')
+                finally:
+                    os.close(fd)
+            timestamp, _, pid = name.partition('-')
+            queue.append(Ticket(name, int(timestamp) / 1e9, int(pid), info.get('label'),
+                                info.get('cpus'), info.get('mem')))
+        return queue
+
+    def count_held(self):
+        """Return the number of CPU and memory slots held by any process on the host"""
+        n_cpus = sum(1 for index in range(os.cpu_count())
+                     if not self._is_free(self.cpu_fd, index, self.held_cpus))
+        n_mem_slots = sum(1 for index in range(self.n_mem_slots)
+                          if not self._is_free(self.mem_fd, index, self.held_mem_slots))
+        return n_cpus, n_mem_slots
+
+    def _is_free(self, fd, index, held):
+        if index in held:
+            return False
+        if _try_lock(fd, index):
+            _unlock(fd, index)
+            return True
+        return False
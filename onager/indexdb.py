@@ -0,0 +1,173 @@
+import csv
+import os
+from warnings import warn
+
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None
+
+# Columns for each index that onager knows how to store in SQLite. Indexes that aren't listed
+# here (or any index, if the SQLite store isn't enabled or the sqlite3 module is unavailable) are
+# stored as plain CSV files.
+INDEX_COLUMNS = {
+    'job_index': ['id', 'jobname', 'jobfile', 'backend', 'tasklist', 'task_offset'],
+    'history_index': ['id', 'date', 'time', 'jobname', 'mode', 'dry_run', 'args'],
+}
+INDEXED_COLUMNS = {
+    'job_index': [['jobname'], ['backend']],
+    'history_index': [['jobname'], ['date', 'time'], ['mode']],
+}
+DATABASE_FILENAME = 'index.sqlite'
+MIGRATED_SUFFIX = '.migrated'
+# The SQLite store is opt-in, since migrating renames the CSV indexes that older versions of
+# onager (and any other tools) read. Once a directory's database exists, it stays in use.
+ENABLE_VAR = 'ONAGER_SQLITE_INDEX'
+
+_connections = {}
+_initialized_tables = set()
+
+def get_table_name(index_name):
+    return os.path.splitext(os.path.basename(index_name))[0]
+
+def get_database_path(index_name):
+    return os.path.join(os.path.dirname(index_name), DATABASE_FILENAME)
+
+def is_enabled(index_name):
+    return os.environ.get(ENABLE_VAR) == '1' or os.path.exists(get_database_path(index_name))
+
+def is_supported(index_name):
+    return (sqlite3 is not None and get_table_name(index_name) in INDEX_COLUMNS
+            and is_enabled(index_name))
+
+def _create_table(connection, index_name):
+    table = get_table_name(index_name)
+    columns = INDEX_COLUMNS[table]
+    column_defs = ['id INTEGER PRIMARY KEY AUTOINCREMENT'] + [
+        '{} TEXT'.format(column) for column in columns[1:]
+    ]
+    connection.execute('CREATE TABLE {} ({})'.format(table, ', '.join(column_defs)))
+    for indexed_columns in INDEXED_COLUMNS[table]:
+        connection.execute('CREATE INDEX {0}_{1} ON {0} ({2})'.format(
+            table, '_'.join(indexed_columns), ', '.join(indexed_columns)))
+    if os.path.exists(index_name):
+        _migrate_csv(connection, index_name)
+
+def _migrate_csv(connection, index_name):
+    """Copy the rows of an existing CSV index into its new table"""
+    table = get_table_name(index_name)
+    n_columns = len(INDEX_COLUMNS[table])
+    rows = []
+    with open(index_name, 'r', newline='') as index_file:
+        csv_reader = csv.reader(index_file, delimiter=',', quotechar='|')
+        for entry in csv_reader:
+            try:
+                entry[0] = int(entry[0])
+            except (IndexError, ValueError):
+                warn('Skipping invalid entry while migrating {}: {}'.format(index_name, entry))
+                continue
+            rows.append((entry + [None] * n_columns)[:n_columns])
+    _insert_rows(connection, table, rows)
+    os.replace(index_name, index_name + MIGRATED_SUFFIX)
+
+def _add_missing_columns(connection, index_name):
+    """Add any columns that are missing from a table created by an older version of onager"""
+    table = get_table_name(index_name)
+    existing = [row[1] for row in connection.execute('PRAGMA table_info({})'.format(table))]
+    for column in INDEX_COLUMNS[table]:
+        if column not in existing:
+            connection.execute('ALTER TABLE {} ADD COLUMN {} TEXT'.format(table, column))
+
+def connect(index_name):
+    """Open the SQLite database for the specified index, creating its table if necessary"""
+    db_path = get_database_path(index_name)
+    connection = _connections.get(db_path)
+    if connection is None:
+        connection = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+        _connections[db_path] = connection
+    table = get_table_name(index_name)
+    if (db_path, table) in _initialized_tables:
+        return connection
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        exists = connection.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?",
+                                    (table, )).fetchone()
+        if not exists:
+            _create_table(connection, index_name)
+        else:
+            _add_missing_columns(connection, index_name)
+    except:
+        connection.execute('ROLLBACK')
+        raise
+    connection.execute('COMMIT')
+    _initialized_tables.add((db_path, table))
+    return connection
+
+def _insert_rows(connection, table, rows):
+    columns = INDEX_COLUMNS[table]
+    placeholders = ', '.join('?' * len(columns))
+    # Rows without an id get the next one, which keeps ids counting up from 0 like the CSV index
+    next_id = '(SELECT COALESCE(MAX(id) + 1, 0) FROM {})'.format(table)
+    for row in rows:
+        if row[0] is None:
+            query = 'INSERT INTO {} ({}) VALUES ({}, {})'.format(
+                table, ', '.join(columns), next_id, ', '.join('?' * (len(columns) - 1)))
+            connection.execute(query, tuple(row[1:]))
+        else:
+            query = 'INSERT OR REPLACE INTO {} ({}) VALUES ({})'.format(
+                table, ', '.join(columns), placeholders)
+            connection.execute(query, tuple(row))
+
+def load_index(index_name):
+    connection = connect(index_name)
+    table = get_table_name(index_name)
+    cursor = connection.execute('SELECT * FROM {} ORDER BY id'.format(table))
+    return {str(row[0]): list(row[1:]) for row in cursor}
+
+def load_index_entry(entry_id, index_name):
+    connection = connect(index_name)
+    table = get_table_name(index_name)
+    row = connection.execute('SELECT * FROM {} WHERE id = ?'.format(table),
+                             (entry_id, )).fetchone()
+    return None if row is None else list(row[1:])
+
+def load_recent_index_entries(index_name, n=None, since=None):
+    """Load the last n rows of an index with date and time columns (all rows, if n is None)
+
+    If since is a (date, time) pair, only rows after it are loaded. Rows are read newest first,
+    straight from the end of the table, and the (date, time) lookup uses the table's index.
+    """
+    connection = connect(index_name)
+    table = get_table_name(index_name)
+    query = 'SELECT * FROM {}'.format(table)
+    params = []
+    if since is not None:
+        query += ' WHERE (date, time) > (?, ?)'
+        params.extend(since)
+    query += ' ORDER BY id DESC'
+    if n is not None:
+        query += ' LIMIT ?'
+        params.append(n)
+    rows = connection.execute(query, params).fetchall()
+    return {str(row[0]): list(row[1:]) for row in reversed(rows)}
+
+def get_next_index_id(index_name):
+    connection = connect(index_name)
+    table = get_table_name(index_name)
+    max_id = connection.execute('SELECT MAX(id) FROM {}'.format(table)).fetchone()[0]
+    return 0 if max_id is None else max_id + 1
+
+def update_index(entries, index_name, append=True):
+    connection = connect(index_name)
+    table = get_table_name(index_name)
+    n_columns = len(INDEX_COLUMNS[table])
+    rows = [(list(entry) + [None] * n_columns)[:n_columns] for entry in entries]
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        if not append:
+            connection.execute('DELETE FROM {}'.format(table))
+        _insert_rows(connection, table, rows)
+    except:
+        connection.execute('ROLLBACK')
+        raise
+    connection.execute('COMMIT')
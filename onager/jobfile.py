@@ -0,0 +1,252 @@
+from bisect import bisect_right
+from collections.abc import Mapping
+import json
+import os
+import struct
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from .sweep import SweepSpec
+from .taskset import TaskSet
+
+# An indexed jobfile is a pair of files:
+#   - the data file (e.g. jobs.jsonl), with one JSON record [task_id, command, tag] per line
+#   - the index file (e.g. jobs.jsonl.idx), an array of fixed-width slots where slot N holds
+#     1 + the byte offset of task N's record in the data file, or 0 if task N does not exist
+# Looking up a single task therefore costs two seeks, regardless of the size of the jobfile.
+# Jobfiles without an index file are either compact sweep jobfiles, which store a JSON dictionary
+# {"sweeps": [...]} of factored sweep specs (see onager.sweep), or legacy jobs.json files, which
+# store a single JSON dictionary mapping task ids to [command, tag] lists.
+INDEX_SUFFIX = '.idx'
+COMMANDS_SUFFIX = '.commands'
+_SLOT = struct.Struct('<Q')
+_CHUNK_SLOTS = 8192
+
+def get_index_path(jobfile_path):
+    return jobfile_path + INDEX_SUFFIX
+
+def is_indexed(jobfile_path):
+    return os.path.exists(get_index_path(jobfile_path))
+
+def _encode_record(task_id, cmd, tag):
+    return (json.dumps([task_id, cmd, tag]) + '\n').encode('utf-8')
+
+def write_jobfile(records, jobfile_path):
+    """Write an iterable of (task_id, command, tag) records to a new indexed jobfile"""
+    index_path = get_index_path(jobfile_path)
+    tmp_jobfile_path = jobfile_path + '.tmp'
+    tmp_index_path = index_path + '.tmp'
+    with open(tmp_jobfile_path, 'wb') as data_file, open(tmp_index_path, 'wb') as index_file:
+        for task_id, cmd, tag in records:
+            offset = data_file.tell()
+            data_file.write(_encode_record(task_id, cmd, tag))
+            index_file.seek(task_id * _SLOT.size)
+            index_file.write(_SLOT.pack(offset + 1))
+    # Replace the data file first, so the new index never points into an old data file
+    os.replace(tmp_jobfile_path, jobfile_path)
+    os.replace(tmp_index_path, index_path)
+
+def append_jobfile(records, jobfile_path):
+    """Append an iterable of (task_id, command, tag) records to an existing indexed jobfile
+
+    Only the new records are written. They go to the end of the data file, and are flushed to
+    disk before the index slots that point to them, so concurrent readers only ever see complete
+    records, and a crash mid-append leaves the existing records intact. The new task ids must be
+    above the jobfile's high-water mark, which is the number of slots in its index.
+    """
+    index_path = get_index_path(jobfile_path)
+    with open(jobfile_path, 'ab') as data_file, open(index_path, 'r+b') as index_file:
+        if fcntl is not None:
+            fcntl.lockf(index_file, fcntl.LOCK_EX)
+        try:
+            next_id = max(1, index_file.seek(0, os.SEEK_END) // _SLOT.size)
+            offset = data_file.seek(0, os.SEEK_END)
+            slots = []
+            for task_id, cmd, tag in records:
+                if task_id < next_id:
+                    raise ValueError('Cannot append task {} to {}: task ids up to {} are already '
+                                     'taken'.format(task_id, jobfile_path, next_id - 1))
+                slots.append((task_id, offset))
+                offset += data_file.write(_encode_record(task_id, cmd, tag))
+            data_file.flush()
+            os.fsync(data_file.fileno())
+            for task_id, offset in slots:
+                index_file.seek(task_id * _SLOT.size)
+                index_file.write(_SLOT.pack(offset + 1))
+            index_file.flush()
+        finally:
+            if fcntl is not None:
+                fcntl.lockf(index_file, fcntl.LOCK_UN)
+
+def get_commands_path(jobfile_path):
+    return jobfile_path + COMMANDS_SUFFIX
+
+def write_commands_file(jobfile_path):
+    """Write a plain-text copy of a jobfile's commands, one per line, and return its path
+
+    The commands file gets an index like the jobfile's, where slot N holds 1 + the byte offset of
+    task N's command, so that native wrapper scripts can look up a command with plain shell tools
+    (od and tail) instead of starting Python. An up-to-date commands file is reused as is.
+    """
+    commands_path = get_commands_path(jobfile_path)
+    index_path = get_index_path(commands_path)
+    if (os.path.exists(index_path)
+            and os.path.getmtime(index_path) >= os.path.getmtime(jobfile_path)):
+        return commands_path
+    tmp_commands_path = commands_path + '.tmp'
+    tmp_index_path = index_path + '.tmp'
+    jobfile = Jobfile(jobfile_path)
+    try:
+        with open(tmp_commands_path, 'wb') as data_file, open(tmp_index_path, 'wb') as index_file:
+            for task_id, cmd, _ in jobfile.iter_records():
+                if '\n' in cmd:
+                    raise ValueError('Task {} has a multi-line command, which native wrapper '
+                                     'scripts cannot look up: {!r}'.format(task_id, cmd))
+                offset = data_file.tell()
+                data_file.write((cmd + '\n').encode('utf-8'))
+                index_file.seek(task_id * _SLOT.size)
+                index_file.write(_SLOT.pack(offset + 1))
+    finally:
+        jobfile.close()
+    os.replace(tmp_commands_path, commands_path)
+    os.replace(tmp_index_path, index_path)
+    return commands_path
+
+def write_sweep_jobfile(sweeps, jobfile_path):
+    """Write a list of SweepSpecs to a new compact jobfile"""
+    tmp_jobfile_path = jobfile_path + '.tmp'
+    with open(tmp_jobfile_path, 'w') as data_file:
+        json.dump({'sweeps': [sweep.to_dict() for sweep in sweeps]}, data_file)
+    # Remove any stale index first, since its presence marks the jobfile as indexed
+    index_path = get_index_path(jobfile_path)
+    if os.path.exists(index_path):
+        os.remove(index_path)
+    os.replace(tmp_jobfile_path, jobfile_path)
+
+class Jobfile(Mapping):
+    """Read-only mapping from task ids to commands that only reads the records it needs"""
+    def __init__(self, jobfile_path):
+        self.path = jobfile_path
+        self.index_path = get_index_path(jobfile_path)
+        self._data_file = None
+        self._index_file = None
+        self._len = None
+        self._legacy_records = None
+        self.sweeps = None
+        if not is_indexed(jobfile_path):
+            with open(jobfile_path, 'r') as file:
+                job_records = json.load(file)
+            if 'sweeps' in job_records:
+                self.sweeps = [SweepSpec.from_dict(spec) for spec in job_records['sweeps']]
+                self._sweep_start_ids = [sweep.start_id for sweep in self.sweeps]
+            else:
+                # json stores all keys as strings, so we convert to ints
+                self._legacy_records = {
+                    int(id_): tuple(record) for id_, record in job_records.items()
+                }
+
+    @property
+    def is_compact(self):
+        return self.sweeps is not None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_data_file'] = None
+        state['_index_file'] = None
+        return state
+
+    def close(self):
+        for file in (self._data_file, self._index_file):
+            if file is not None:
+                file.close()
+        self._data_file = None
+        self._index_file = None
+
+    def _get_offset(self, task_id):
+        if task_id < 0:
+            return None
+        if self._index_file is None:
+            self._index_file = open(self.index_path, 'rb')
+        self._index_file.seek(task_id * _SLOT.size)
+        slot = self._index_file.read(_SLOT.size)
+        if len(slot) < _SLOT.size:
+            return None
+        offset = _SLOT.unpack(slot)[0]
+        return offset - 1 if offset > 0 else None
+
+    def get_record(self, task_id):
+        """Return the (command, tag) record for the specified task id"""
+        if self._legacy_records is not None:
+            return self._legacy_records[task_id]
+        if self.sweeps is not None:
+            sweep_idx = bisect_right(self._sweep_start_ids, task_id) - 1
+            if sweep_idx < 0:
+                raise KeyError(task_id)
+            return self.sweeps[sweep_idx].get_record(task_id)
+        offset = self._get_offset(task_id)
+        if offset is None:
+            raise KeyError(task_id)
+        if self._data_file is None:
+            self._data_file = open(self.path, 'rb')
+        self._data_file.seek(offset)
+        record_id, cmd, tag = json.loads(self._data_file.readline())
+        if record_id != task_id:
+            raise RuntimeError('Corrupt jobfile index: {}'.format(self.index_path))
+        return cmd, tag
+
+    def get_next_id(self):
+        """Return the first unused task id after all existing tasks"""
+        if self._legacy_records is not None:
+            return max(self._legacy_records.keys(), default=0) + 1
+        if self.sweeps is not None:
+            return self.sweeps[-1].stop_id if self.sweeps else 1
+        return max(1, os.path.getsize(self.index_path) // _SLOT.size)
+
+    def get_taskset(self):
+        """Return the set of task ids in the jobfile"""
+        if self.sweeps is not None:
+            return TaskSet([range(sweep.start_id, sweep.stop_id) for sweep in self.sweeps])
+        return TaskSet.from_ids(self)
+
+    def iter_records(self):
+        """Lazily yield (task_id, command, tag) for every task, in task id order"""
+        for task_id in self:
+            yield (task_id, *self.get_record(task_id))
+
+    def get_tag(self, task_id):
+        return self.get_record(task_id)[1]
+
+    def __getitem__(self, task_id):
+        return self.get_record(task_id)[0]
+
+    def __iter__(self):
+        if self._legacy_records is not None:
+            yield from sorted(self._legacy_records.keys())
+            return
+        if self.sweeps is not None:
+            for sweep in self.sweeps:
+                yield from range(sweep.start_id, sweep.stop_id)
+            return
+        with open(self.index_path, 'rb') as index_file:
+            task_id = 0
+            while True:
+                chunk = index_file.read(_CHUNK_SLOTS * _SLOT.size)
+                n_slots = len(chunk) // _SLOT.size
+                if n_slots == 0:
+                    break
+                for (offset, ) in _SLOT.iter_unpack(chunk[:n_slots * _SLOT.size]):
+                    if offset > 0:
+                        yield task_id
+                    task_id += 1
+
+    def __len__(self):
+        if self._legacy_records is not None:
+            return len(self._legacy_records)
+        if self.sweeps is not None:
+            return sum(len(sweep) for sweep in self.sweeps)
+        if self._len is None:
+            self._len = sum(1 for _ in self)
+        return self._len
@@ -1,27 +1,74 @@
 import re
 import os
 
+from . import constants
 from .backends import prepare_backend
-from .constants import defaultjobfile
-from .utils import load_jobfile, save_jobfile
+from .cache import prepare_cache
+from .jobfile import Jobfile
+from .state import get_resume_tasks, is_native_job
+from .taskset import TaskSet
+from .utils import get_jobfile_path, save_jobfile, load_jobindex_entry
+
+def prepare_resume(args):
+    """Fill in the jobname, jobfile and remaining tasklist of the job being resumed"""
+    entry = load_jobindex_entry(args.resume)
+    if entry is None:
+        raise ValueError('Unable to resume job {}: job not found in index'.format(args.resume))
+    if is_native_job(args.resume):
+        raise ValueError('Unable to resume job {}: it was launched with --wrapper native, which '
+                         'does not record which tasks finished'.format(args.resume))
+    if args.jobname is None:
+        args.jobname = entry.jobname
+    if args.jobfile == constants.defaultjobfile:
+        args.jobfile = entry.jobfile
+    remaining, failures = get_resume_tasks(args.resume, args.retry_failed)
+    if args.tasklist is not None:
+        remaining = remaining & TaskSet.from_string(args.tasklist)
+    args.tasklist = str(remaining)
+    args.resume_failures = failures
+    return bool(remaining)
 
 def launch(args, other_args):
+    if args.resume is not None:
+        if args.command is not None:
+            # Saving the command would overwrite the resumed job's jobfile
+            raise ValueError("--command can't be combined with --resume, which reruns the "
+                             "resumed job's own commands")
+        if not prepare_resume(args):
+            print('Nothing to resume: job {} has no remaining tasks to run.'.format(args.resume))
+            return
+    elif args.jobname is None:
+        raise ValueError('The --jobname argument is required (unless resuming with --resume)')
+
+    if args.wrapper == 'native' and args.tasks_per_node > 1:
+        raise ValueError('The native wrapper only supports --tasks-per-node 1')
+    if args.wrapper == 'native' and args.backend != 'local' and args.cache:
+        raise ValueError('--cache is not supported with --wrapper native, which does not record '
+                         'which tasks succeeded')
+    if args.work_queue and (args.balance_weights is not None or args.balance_history):
+        raise ValueError('--balance-weights and --balance-history can\'t be combined with '
+                         '--work-queue, which doesn\'t split tasks into groups')
+    if args.forkserver and args.backend != 'local' and args.tasks_per_node == 1:
+        raise ValueError('--forkserver requires the local backend, or --tasks-per-node > 1')
+
     if not re.match(r'^(\w|\.|-)+$', args.jobname):
         # We want to create a script file, so make sure the filename is legit
         raise ValueError("Invalid job name: {}".format(args.jobname))
 
-    if args.jobfile == defaultjobfile:
-        args.jobfile = args.jobfile.format(jobname=args.jobname)
+    args.jobfile = get_jobfile_path(args.jobfile, args.jobname)
     os.makedirs(os.path.dirname(args.jobfile), exist_ok=True)
     if args.command is not None:
         save_jobfile({1: (args.command, '')}, args.jobfile)
-    commands = load_jobfile(args.jobfile)[0]
+    commands = Jobfile(args.jobfile)
 
     backend = prepare_backend(args)
 
     # Update additional arguments
     if args.tasklist is None:
         args.tasklist = backend.generate_tasklist(commands)
+    if args.cache and not prepare_cache(args, commands):
+        print('Nothing to launch: every task has already succeeded.')
+        return
 
     jobs = backend.get_job_list(args)
 
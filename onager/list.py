@@ -1,8 +1,14 @@
 from collections import namedtuple
+import csv
+from itertools import islice
+import json
+import sys
 
 from tabulate import tabulate
 
-from .utils import load_jobindex, expand_ids, load_jobfile
+from .jobfile import Jobfile
+from .taskset import TaskSet
+from .utils import load_jobindex, load_jobindex_entry
 
 JobListing = namedtuple('JobListing', ['job_id', 'task_id', 'jobname', 'command', 'tag'])
 
@@ -16,37 +22,68 @@ def make_listing(jobid, task_id, jobname, command, tags, args):
         listing = JobListing(**listing)
     return listing
 
-def get_job_listings(args):
-    def in_joblist(job_id):
-        return True if args.jobid is None else job_id == args.jobid
-    def in_tasklist(task_id):
-        return True if args.tasklist is None else task_id in expand_ids(args.tasklist)
-
-    job_list = []
+def get_job_index_entries(args):
+    """Yield (jobid, JobIndexEntry) pairs for the jobs selected by args.jobid (an id or list)"""
     try:
-        index = load_jobindex()
+        if args.jobid is None:
+            yield from load_jobindex().items()
+        else:
+            jobids = args.jobid if isinstance(args.jobid, list) else [args.jobid]
+            for jobid in jobids:
+                entry = load_jobindex_entry(jobid)
+                if entry is not None:
+                    yield jobid, entry
     except (IOError):
-        return job_list
-    for jobid in index.keys():
-        if not in_joblist(jobid):
-            continue
-        jobname, jobfile = index[jobid]
-        commands, tags = load_jobfile(jobfile)
-        for task_id in sorted(commands.keys()):
-            if not in_tasklist(task_id):
-                continue
-            listing = make_listing(
-                jobid,
-                task_id,
-                jobname,
-                repr(commands[task_id]),
-                tags[task_id],
-                args
-            )
-            job_list.append(listing)
-    return job_list
+        return
+
+def get_job_tasksets(args):
+    """Yield (jobid, JobIndexEntry, Jobfile, TaskSet) for each selected job and its selected tasks"""
+    # Parse the tasklist once, rather than once per task
+    taskset = None if args.tasklist is None else TaskSet.from_string(args.tasklist)
+    for jobid, entry in get_job_index_entries(args):
+        jobfile = Jobfile(entry.jobfile)
+        job_taskset = jobfile.get_taskset()
+        if entry.tasklist:
+            # Only the tasks that were launched with this job
+            job_taskset = job_taskset & TaskSet.from_string(entry.tasklist)
+        if taskset is not None:
+            job_taskset = job_taskset & taskset
+        yield jobid, entry, jobfile, job_taskset
+        jobfile.close()
+
+def _iter_job_listings(args):
+    for jobid, entry, jobfile, job_taskset in get_job_tasksets(args):
+        for task_id in job_taskset:
+            command, tag = jobfile.get_record(task_id)
+            yield make_listing(jobid, task_id, entry.jobname, command, tag, args)
+
+def iter_job_listings(args):
+    """Lazily yield a JobListing for each selected task, loading only the selected jobfiles"""
+    job_listings = _iter_job_listings(args)
+    offset = args.offset if 'offset' in args else 0
+    limit = args.limit if 'limit' in args else None
+    if offset or limit is not None:
+        stop = None if limit is None else offset + limit
+        job_listings = islice(job_listings, offset, stop)
+    return job_listings
+
+def get_job_listings(args):
+    return list(iter_job_listings(args))
 
 def list_commands(args):
-    """Parse the jobs/tasks to cancel and send the appropriate commands to the cluster"""
-    job_list = get_job_listings(args)
-    print(tabulate(job_list, headers=JobListing._fields))
+    """Print the commands for the selected jobs/tasks"""
+    job_listings = iter_job_listings(args)
+    if args.format == 'csv':
+        csv_writer = csv.writer(sys.stdout)
+        csv_writer.writerow(JobListing._fields)
+        for listing in job_listings:
+            csv_writer.writerow(listing)
+    elif args.format == 'jsonl':
+        for listing in job_listings:
+            print(json.dumps(listing._asdict()))
+    else:
+        if 'hide' in args and args.hide is not None and 'command' in args.hide:
+            rows = list(job_listings)
+        else:
+            rows = [listing._replace(command=repr(listing.command)) for listing in job_listings]
+        print(tabulate(rows, headers=JobListing._fields))
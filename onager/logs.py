@@ -0,0 +1,371 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import mmap
+import os
+import re
+import shutil
+import struct
+import sys
+import zlib
+
+from .constants import default_logs_folder
+from .jobfile import Jobfile
+from .list import get_job_tasksets
+from .taskset import TaskSet
+from .utils import load_jobindex_entry, cpu_count
+
+# With --shard-logs, each task's logs go in shard subdirectory task_id % SHARD_COUNT (in hex), so
+# that no single directory holds more than a small fraction of a large sweep's log files:
+#   .onager/logs/<backend>/<jobname>_<jobid>/<shard>/<task_id>.{o,e}
+# Multiworker subjob logs are sharded the same way under <jobname>_<jobid>_subjobs/.
+SHARD_COUNT = 256
+LOG_EXTENSIONS = ('.o', '.e')
+STREAM_NAMES = ('stdout', 'stderr')
+
+# Logs at least this large are searched through a memory map rather than read into memory
+MMAP_THRESHOLD = 1024**2
+TAIL_BLOCK_SIZE = 8192
+# Number of tasks whose logs each process pool job searches
+SEARCH_CHUNK_SIZE = 64
+
+# A log pack is a pair of files, laid out like an indexed jobfile:
+#   - the data file (<jobname>_<jobid>.pack), with every log of the job stored back to back
+#   - the index file (<jobname>_<jobid>.pack.idx), an array of fixed-width slots where slot
+#     2*N + S holds (1 + byte offset, length, compressed) for stream S (0 = .o, 1 = .e) of task N,
+#     or zeros if that log does not exist
+# Reading one task's log therefore costs two seeks, regardless of the number of tasks.
+PACK_SUFFIX = '.pack'
+INDEX_SUFFIX = '.idx'
+_SLOT = struct.Struct('<QQB')
+
+def get_shard(task_id):
+    return '{:02x}'.format(int(task_id) % SHARD_COUNT)
+
+def get_sharded_log_path(log_dir, task_id, ext):
+    return os.path.join(log_dir, get_shard(task_id), '{}{}'.format(task_id, ext))
+
+def get_shard_cmds(log_dir, task_id_var):
+    """Shell commands that redirect a wrapper script's output to its sharded log files"""
+    return '\n'.join([
+        'ONAGER_TASK_ID={}'.format(task_id_var),
+        'ONAGER_LOG_DIR={}/$(printf "%02x" $((ONAGER_TASK_ID % {})))'.format(log_dir, SHARD_COUNT),
+        'mkdir -p $ONAGER_LOG_DIR',
+        'exec >$ONAGER_LOG_DIR/$ONAGER_TASK_ID.o 2>$ONAGER_LOG_DIR/$ONAGER_TASK_ID.e',
+    ])
+
+class JobLogs:
+    """Locates the log files of each task in a previously launched job"""
+    def __init__(self, jobid, entry):
+        self.log_dir = os.path.join(default_logs_folder, entry.backend)
+        self.prefix = '{}_{}'.format(entry.jobname, jobid)
+        self.task_offset = int(entry.task_offset or 0)
+        self.sharded = os.path.isdir(os.path.join(self.log_dir, self.prefix))
+        self.subjobs_dir = os.path.join(self.log_dir, self.prefix + '_subjobs')
+        if not os.path.isdir(self.subjobs_dir):
+            self.subjobs_dir = None
+        self._subjob_names = {}
+        if self.subjobs_dir is not None and not self.sharded:
+            # Unsharded subjob logs are named <subjob_group_id>_<task_id>, and the group ids
+            # aren't recorded, so this is the one layout where the directory must be listed
+            for dir_entry in os.scandir(self.subjobs_dir):
+                name, ext = os.path.splitext(dir_entry.name)
+                if ext == '.o' and '_' in name:
+                    self._subjob_names[name.split('_', 1)[1]] = name
+
+    def get_pack_path(self):
+        return os.path.join(self.log_dir, self.prefix + PACK_SUFFIX)
+
+    def open_pack(self):
+        """Return a LogPack of the job's logs, or None if they haven't been packed"""
+        pack_path = self.get_pack_path()
+        return LogPack(pack_path) if os.path.exists(pack_path) else None
+
+    def get_paths(self, task_id):
+        """Return the (stdout, stderr) log paths for a task, or None if they can't be found"""
+        if self.subjobs_dir is not None:
+            if self.sharded:
+                return tuple(get_sharded_log_path(self.subjobs_dir, task_id, ext)
+                             for ext in LOG_EXTENSIONS)
+            name = self._subjob_names.get(str(task_id))
+            if name is None:
+                return None
+            return tuple(os.path.join(self.subjobs_dir, name + ext) for ext in LOG_EXTENSIONS)
+        if self.sharded:
+            return tuple(get_sharded_log_path(os.path.join(self.log_dir, self.prefix), task_id, ext)
+                         for ext in LOG_EXTENSIONS)
+        # Cluster logs are named by array index, which is offset from the task id
+        name = '{}_{}'.format(self.prefix, int(task_id) - self.task_offset)
+        return tuple(os.path.join(self.log_dir, name + ext) for ext in LOG_EXTENSIONS)
+
+class LogPack:
+    """Read-only access to the logs stored in a log pack"""
+    def __init__(self, pack_path):
+        self.path = pack_path
+        self._data_file = open(pack_path, 'rb')
+        self._index_file = open(pack_path + INDEX_SUFFIX, 'rb')
+
+    def close(self):
+        self._data_file.close()
+        self._index_file.close()
+
+    def read_stored(self, task_id, stream=0):
+        """Return one of a task's logs as stored (data, compressed), or None"""
+        self._index_file.seek((2 * int(task_id) + stream) * _SLOT.size)
+        slot = self._index_file.read(_SLOT.size)
+        if len(slot) < _SLOT.size:
+            return None
+        offset, length, compressed = _SLOT.unpack(slot)
+        if offset == 0:
+            return None
+        self._data_file.seek(offset - 1)
+        return self._data_file.read(length), bool(compressed)
+
+    def read(self, task_id, stream=0):
+        """Return the contents of one of a task's logs (0 = stdout, 1 = stderr), or None"""
+        stored = self.read_stored(task_id, stream)
+        if stored is None:
+            return None
+        data, compressed = stored
+        return zlib.decompress(data) if compressed else data
+
+def _remove_empty_dirs(log_paths, stop_dir):
+    dirs = {os.path.dirname(path) for path in log_paths}
+    for dirname in sorted(dirs, key=len, reverse=True):
+        while dirname != stop_dir and dirname.startswith(stop_dir):
+            try:
+                os.rmdir(dirname)
+            except OSError:
+                break
+            dirname = os.path.dirname(dirname)
+
+def _read_log(log_path):
+    if log_path is None:
+        return None
+    try:
+        with open(log_path, 'rb') as log_file:
+            return log_file.read()
+    except FileNotFoundError:
+        return None
+
+def write_log_pack(job_logs, task_ids, compress_threshold=-1):
+    """Copy each task's logs into a new log pack, and return the paths of the copied log files
+
+    Logs larger than compress_threshold bytes are compressed with zlib (never, if negative). If the
+    job was already packed, the logs in the existing pack are carried over into the new one,
+    except where a log file has been written since.
+    """
+    pack_path = job_logs.get_pack_path()
+    index_path = pack_path + INDEX_SUFFIX
+    tmp_pack_path = pack_path + '.tmp'
+    tmp_index_path = index_path + '.tmp'
+    old_pack = job_logs.open_pack()
+    packed_paths = []
+    try:
+        with open(tmp_pack_path, 'wb') as data_file, open(tmp_index_path, 'wb') as index_file:
+            for task_id in task_ids:
+                paths = job_logs.get_paths(task_id) or (None, None)
+                for stream, log_path in enumerate(paths):
+                    data = _read_log(log_path)
+                    if data is None:
+                        stored = old_pack.read_stored(task_id, stream) if old_pack else None
+                        if stored is None:
+                            continue
+                        data, compressed = stored
+                    else:
+                        compressed = False
+                        if 0 <= compress_threshold < len(data):
+                            compressed_data = zlib.compress(data)
+                            if len(compressed_data) < len(data):
+                                data, compressed = compressed_data, True
+                        packed_paths.append(log_path)
+                    offset = data_file.tell()
+                    data_file.write(data)
+                    index_file.seek((2 * task_id + stream) * _SLOT.size)
+                    index_file.write(_SLOT.pack(offset + 1, len(data), compressed))
+    finally:
+        if old_pack is not None:
+            old_pack.close()
+    os.replace(tmp_pack_path, pack_path)
+    os.replace(tmp_index_path, index_path)
+    return packed_paths
+
+def pack_logs(args):
+    """Bundle the log files of each finished job into a single indexed log pack"""
+    entries = [(jobid, load_jobindex_entry(jobid)) for jobid in args.jobid]
+    for jobid, entry in entries:
+        if entry is None:
+            raise ValueError('Job {} not found in the job index'.format(jobid))
+    for jobid, entry in entries:
+        pack_job_logs(jobid, entry, args)
+
+def pack_job_logs(jobid, entry, args):
+    job_logs = JobLogs(jobid, entry)
+    if entry.tasklist is not None:
+        task_ids = TaskSet.from_string(entry.tasklist)
+    else:
+        jobfile = Jobfile(entry.jobfile)
+        task_ids = jobfile.get_taskset()
+        jobfile.close()
+    packed_paths = write_log_pack(job_logs, task_ids, args.compress_threshold)
+    if not args.keep:
+        for log_path in packed_paths:
+            os.remove(log_path)
+        _remove_empty_dirs(packed_paths, job_logs.log_dir)
+    print('Packed {} log files from job {} into {}'.format(len(packed_paths), jobid,
+                                                            job_logs.get_pack_path()))
+
+def tail_lines(log_file, n_lines):
+    """Return the last n_lines lines of a binary file, reading blocks backwards from the end"""
+    position = log_file.seek(0, os.SEEK_END)
+    data = b''
+    # One more newline than lines requested marks the start of the first line
+    while position > 0 and data.count(b'\n') <= n_lines:
+        block_size = min(TAIL_BLOCK_SIZE, position)
+        position -= block_size
+        log_file.seek(position)
+        data = log_file.read(block_size) + data
+    return _last_lines(data.splitlines(), n_lines)
+
+def _last_lines(lines, n_lines):
+    return lines[-n_lines:] if n_lines > 0 else []
+
+def grep_lines(data, regex):
+    """Yield each line of data (bytes or an mmap) that matches regex, without splitting it all"""
+    position = 0
+    while position <= len(data):
+        match = regex.search(data, position)
+        if match is None:
+            return
+        line_start = data.rfind(b'\n', 0, match.start()) + 1
+        line_end = data.find(b'\n', match.end())
+        if line_end == -1:
+            line_end = len(data)
+        yield data[line_start:line_end]
+        position = line_end + 1
+
+def read_log_lines(paths, pack, task_id, stream, tail=None, regex=None):
+    """Return the tail and/or matching lines of one of a task's logs, or None if it doesn't exist
+
+    The task's log paths (or None) come from JobLogs.get_paths, and are only used when the log
+    isn't in the pack.
+    """
+    data = None if pack is None else pack.read(task_id, stream)
+    if data is not None:
+        lines = _last_lines(data.splitlines(), tail) if tail is not None else None
+        if regex is None:
+            return lines
+        if lines is None:
+            return list(grep_lines(data, regex))
+        return [line for line in lines if regex.search(line)]
+
+    if paths is None:
+        return None
+    try:
+        log_file = open(paths[stream], 'rb')
+    except FileNotFoundError:
+        return None
+    with log_file:
+        if tail is not None:
+            lines = tail_lines(log_file, tail)
+            return lines if regex is None else [line for line in lines if regex.search(line)]
+        size = os.fstat(log_file.fileno()).st_size
+        if size >= MMAP_THRESHOLD:
+            # Let the OS page in large logs, rather than copying them into memory
+            with mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return list(grep_lines(data, regex))
+        return list(grep_lines(log_file.read(), regex))
+
+def search_logs(pack_path, tasks, streams, tail=None, pattern=None):
+    """Return (task_id, stream, lines) for each of the selected logs of the given tasks
+
+    tasks is a list of (task_id, paths) pairs, so that workers are only sent the log paths of
+    their own chunk, rather than the whole JobLogs.
+    """
+    regex = None if pattern is None else re.compile(pattern.encode('utf-8'), re.MULTILINE)
+    pack = LogPack(pack_path) if os.path.exists(pack_path) else None
+    results = []
+    for task_id, paths in tasks:
+        for stream in streams:
+            lines = read_log_lines(paths, pack, task_id, stream, tail, regex)
+            if lines is not None:
+                results.append((task_id, stream, lines))
+    if pack is not None:
+        pack.close()
+    return results
+
+def iter_search_results(job_logs, taskset, streams, tail, pattern, n_workers):
+    """Search the logs of a taskset in chunks across a process pool, yielding results in order
+
+    At most 2 * n_workers chunks are in flight at once, to bound the memory used by the results.
+    """
+    pack_path = job_logs.get_pack_path()
+    chunks = ([(task_id, job_logs.get_paths(task_id)) for task_id in chunk]
+              for chunk in taskset.chunks(SEARCH_CHUNK_SIZE))
+    if len(taskset) <= SEARCH_CHUNK_SIZE or n_workers <= 1:
+        for tasks in chunks:
+            yield from search_logs(pack_path, tasks, streams, tail, pattern)
+        return
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        pending = deque()
+        for tasks in chunks:
+            pending.append(executor.submit(search_logs, pack_path, tasks, streams, tail, pattern))
+            if len(pending) >= 2 * n_workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+def _decode(line):
+    return line.decode('utf-8', errors='replace')
+
+def print_logs(job_logs, taskset, streams):
+    """Print the full logs of each task, copying them straight to stdout"""
+    pack = job_logs.open_pack()
+    for task_id in taskset:
+        paths = job_logs.get_paths(task_id)
+        for stream in streams:
+            data = None if pack is None else pack.read(task_id, stream)
+            if data is None and paths is not None and os.path.exists(paths[stream]):
+                print('==> task {} ({}) <=='.format(task_id, STREAM_NAMES[stream]), flush=True)
+                with open(paths[stream], 'rb') as log_file:
+                    shutil.copyfileobj(log_file, sys.stdout.buffer)
+                sys.stdout.buffer.flush()
+            elif data is not None:
+                print('==> task {} ({}) <=='.format(task_id, STREAM_NAMES[stream]))
+                print(_decode(data), end='')
+    if pack is not None:
+        pack.close()
+
+def print_search_results(job_logs, taskset, streams, args):
+    results = iter_search_results(job_logs, taskset, streams, args.tail, args.grep,
+                                  args.workers or cpu_count())
+    for task_id, stream, lines in results:
+        if args.grep is not None:
+            for line in lines:
+                print('{}:{}: {}'.format(task_id, STREAM_NAMES[stream], _decode(line)))
+        else:
+            print('==> task {} ({}) <=='.format(task_id, STREAM_NAMES[stream]))
+            for line in lines:
+                print(_decode(line))
+
+def show_logs(args):
+    """Print the logs (or their tails, or matching lines) of the selected tasks of a job"""
+    streams = [0, 1] if args.stream == 'both' else [STREAM_NAMES.index(args.stream)]
+    found = set()
+    for jobid, entry, jobfile, taskset in get_job_tasksets(args):
+        found.add(jobid)
+        if len(args.jobid) > 1:
+            print('==> job {} <=='.format(jobid))
+        job_logs = JobLogs(jobid, entry)
+        if args.tail is None and args.grep is None:
+            print_logs(job_logs, taskset, streams)
+        else:
+            print_search_results(job_logs, taskset, streams, args)
+    for jobid in args.jobid:
+        if jobid not in found:
+            print('Job {} not found in the job index'.format(jobid))
+
+def logs(args):
+    if args.action == 'show':
+        show_logs(args)
+    elif args.action == 'pack':
+        pack_logs(args)
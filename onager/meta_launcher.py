@@ -1,11 +1,19 @@
 from collections import OrderedDict
+from itertools import chain
 import os
 from warnings import warn
 
-from .utils import load_jobfile, save_jobfile
-from .constants import SEP, WSEP, FLAG_ON, FLAG_OFF
+from .jobfile import Jobfile, append_jobfile, is_indexed, write_jobfile, write_sweep_jobfile
+from .sweep import SweepSpec
+from .utils import get_jobfile_path
 from .history import add_new_history_entry
 
+def print_records(records):
+    """Print each command as it streams past on its way to the jobfile writer"""
+    for task_id, cmd, tag in records:
+        print(cmd)
+        yield task_id, cmd, tag
+
 def meta_launch(args):
     base_cmd = args.command
 
@@ -33,13 +41,10 @@ def meta_launch(args):
 
     base_cmd_args = list(variables.keys())
 
-    cmd_prefix_list = [base_cmd]
-
     if args.tag == '':
         raise ValueError("+tag cannot be an empty string")
 
     if args.tag is not None:
-        cmd_suffix_list = ['']
         if args.tag_args is None:
             args.tag_args = base_cmd_args
         else:
@@ -48,90 +53,54 @@ def meta_launch(args):
                     warn(RuntimeWarning("{} is not a command arg: {}".format(tag_arg,
                         base_cmd_args)))
 
-
-    # Positional arguments
-    for value_list in pos_variables:
-        cmd_prefix_list = [prefix + ' {}' for prefix in cmd_prefix_list]
-        cmd_prefix_list = [prefix.format(v) for v in value_list for prefix in cmd_prefix_list]
-        if args.tag is not None:
-            value_slot = WSEP + '{}'
-            cmd_suffix_list = [
-                suffix + value_slot for suffix in cmd_suffix_list
-            ]
-            cmd_suffix_list = [
-                suffix.format(v) for v in value_list for suffix in cmd_suffix_list
-            ]
-
-    # Optional arguments
-    for key, value_list in variables.items():
-        cmd_prefix_list = [prefix + ' ' + key for prefix in cmd_prefix_list]
-        if len(value_list) > 0:
-            cmd_prefix_list = [prefix + VAR_SEP + '{}' for prefix in cmd_prefix_list]
-            cmd_prefix_list = [prefix.format(v) for v in value_list for prefix in cmd_prefix_list]
-        if args.tag is not None:
-            if key in args.tag_args:
-                value_slot = SEP + '{}' if len(value_list) > 0 else ''
-                keyname = key.replace('_', '').replace('-', '').replace('=','_').replace('/','.')
-                cmd_suffix_list = [
-                    suffix + WSEP + keyname + value_slot for suffix in cmd_suffix_list
-                ]
-                if len(value_list) > 0:
-                    cmd_suffix_list = [
-                        suffix.format(v) for v in value_list for suffix in cmd_suffix_list
-                    ]
-            else:
-                cmd_suffix_list = [suffix for v in value_list for suffix in cmd_suffix_list]
-
-    # Flag/Boolean arguments
-    for flag in flag_variables:
-        cmd_prefix_list = [prefix + ' {}' for prefix in cmd_prefix_list] + cmd_prefix_list
-        cmd_prefix_list = [
-            prefix.format(flag) if '{}' in prefix else prefix
-            for prefix in cmd_prefix_list
-        ]
-        if args.tag is not None:
-            cmd_suffix_list = [
-                suffix + '{}' for suffix in cmd_suffix_list
-            ]
-            cmd_suffix_list = [
-                suffix.format(WSEP + s + flag.replace(FLAG_OFF, '').replace(FLAG_ON, ''))
-                for s in [FLAG_ON, FLAG_OFF]
-                for suffix in cmd_suffix_list
-            ]
-
     jobfile_path = args.jobfile.format(jobname=args.jobname)
     os.makedirs(os.path.dirname(jobfile_path), exist_ok=True)
 
     if args.append:
-        cmds, tags = load_jobfile(jobfile_path)
-        start_jobid = max(cmds.keys()) + 1
-        jobs = {i: (cmds[i], tags[i]) for i in cmds.keys()}
+        existing_jobfile = Jobfile(get_jobfile_path(args.jobfile, args.jobname))
+        start_jobid = existing_jobfile.get_next_id()
+        # Appending to a compact jobfile just adds another sweep spec
+        compact = existing_jobfile.is_compact
+        if args.compact and not compact:
+            raise ValueError('Cannot append a compact sweep to a non-compact jobfile')
     else:
-        jobs = dict()
+        existing_jobfile = None
         start_jobid = 1
-
-    if args.tag is not None:
-        if args.no_tag_number:
-            tag_list = [args.jobname + suffix for suffix in cmd_suffix_list]
-        else:
-            n_digits = len(str(start_jobid + len(cmd_suffix_list) - 1))
-            tag_number_format = '{{:0{0}d}}'.format(n_digits)
-            tag_list = [
-                args.jobname + SEP + tag_number_format.format(i) + suffix
-                for (i, suffix) in enumerate(cmd_suffix_list, start_jobid)
-            ]
-
-        cmd_prefix_list = [
-            (prefix + ' ' + args.tag + VAR_SEP + suffix)
-            for (prefix, suffix) in zip(cmd_prefix_list, tag_list)
-        ]
-    else:
-        tag_list = [""]*len(cmd_prefix_list)
-
-    for i, (cmd,tag) in enumerate(zip(cmd_prefix_list,tag_list), start_jobid):
+        compact = args.compact
+
+    sweep = SweepSpec(
+        base_cmd,
+        var_sep=VAR_SEP,
+        pos_args=pos_variables,
+        args=variables.items(),
+        flags=flag_variables,
+        tag=args.tag,
+        tag_args=args.tag_args,
+        jobname=args.jobname,
+        tag_number=not args.no_tag_number,
+        start_id=start_jobid,
+    )
+    if compact:
+        # Only expand the sweep to print its commands, so that a quiet prelaunch costs the same
+        # for any number of tasks
         if not args.quiet:
-            print(cmd)
-        jobs[i] = (cmd,tag)
+            for _ in print_records(sweep.iter_records()):
+                pass
+        sweeps = existing_jobfile.sweeps if existing_jobfile is not None else []
+        write_sweep_jobfile(sweeps + [sweep], jobfile_path)
+        add_new_history_entry(jobname=args.jobname, dry_run=False)
+        return
+
+    records = sweep.iter_records()
+    if not args.quiet:
+        records = print_records(records)
+    if existing_jobfile is not None and is_indexed(existing_jobfile.path):
+        existing_jobfile.close()
+        append_jobfile(records, existing_jobfile.path)
+    else:
+        if existing_jobfile is not None:
+            # Legacy jobfiles are converted to indexed jobfiles on their first append
+            records = chain(existing_jobfile.iter_records(), records)
+        write_jobfile(records, jobfile_path)
 
-    save_jobfile(jobs, jobfile_path, args.tag)
     add_new_history_entry(jobname=args.jobname, dry_run=False)
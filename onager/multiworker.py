@@ -7,16 +7,19 @@ import os
 import subprocess
 import sys
 
-from .utils import load_jobfile, compute_subjobs_filename
+from .utils import compute_subjobs_filename
 from .backends.local import LocalBackend
 from .backends import __all__ as backend_names
 from .subjobsfilemanager import SubjobsFileManager
+from .workqueue import get_cursor_path
 
 def run_subjobs_with_local_backend(args):
     subjobsfile = compute_subjobs_filename(args.jobfile)
     sfm = SubjobsFileManager(subjobsfile)
     subjobs = sfm.get_subjobs_dict()
     args.tasklist = subjobs[args.subjob_group_id]
+    if args.work_queue:
+        args.cursor_path = get_cursor_path(subjobsfile, args.subjob_group_id)
 
     backend = LocalBackend(logging_name=args.logging_backend)
     jobs = backend.get_job_list(args)
@@ -37,6 +40,26 @@ def parse_args():
         help='Which batch of subjobs to run')
     parser.add_argument('--max-subjobs', type=int, default=-1,
         help='Maximum number of simultaneous subjobs')
+    parser.add_argument('--work-queue', action='store_true',
+        help='Pull tasks from the subjob group shared by all nodes until it is drained')
+    parser.add_argument('--cpus', type=int, default=1,
+        help='Number of CPUs available to the node')
+    parser.add_argument('--mem', type=int, default=2,
+        help='Amount of RAM (in GB) available to the node')
+    parser.add_argument('--pin-cpus', action='store_true',
+        help='Pin each subjob to its own share of the available cores')
+    parser.add_argument('--mem-admission', action='store_true',
+        help="Only start subjobs when their share of --mem fits in available memory")
+    parser.add_argument('--mem-limit', action='store_true',
+        help="Limit the address space of each subjob to its share of --mem")
+    parser.add_argument('--host-slots', action='store_true',
+        help="Wait for CPU/memory slots shared with the other --host-slots launches on the host")
+    parser.add_argument('--shard-logs', action='store_true',
+        help="Shard subjob log files into subdirectories by task id")
+    parser.add_argument('--forkserver', action='store_true',
+        help="Run 'module:function args...' subjobs in processes forked from a fork server")
+    parser.add_argument('--preload', type=str, nargs='+', default=None, metavar='MODULE',
+        help='Modules for the fork server to import once, before forking any subjobs')
     return parser.parse_args()
 
 if __name__ == '__main__':
@@ -0,0 +1,195 @@
+import asyncio
+from collections import namedtuple
+from functools import partial
+import math
+import os
+import sys
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+MEMINFO_FILE = '/proc/meminfo'
+GB = 1024**3
+
+Allocation = namedtuple('Allocation', ['cpus', 'mem_bytes', 'host_slots'], defaults=[None])
+
+def read_meminfo(field):
+    """Return a /proc/meminfo field (e.g. 'MemAvailable') in bytes, or None if unknown"""
+    try:
+        with open(MEMINFO_FILE, 'r') as meminfo:
+            for line in meminfo:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) * 1024
+    except (IOError, ValueError, IndexError):
+        pass
+    return None
+
+def get_available_memory():
+    """Return the available memory in bytes (as reported by /proc/meminfo), or None if unknown"""
+    return read_meminfo('MemAvailable')
+
+def get_usage(rusage):
+    """Summarize the resource usage of a child process (from os.wait4) for the task state store"""
+    # ru_maxrss is in kilobytes on Linux, but bytes on macOS
+    maxrss = rusage.ru_maxrss if sys.platform == 'darwin' else rusage.ru_maxrss * 1024
+    return {
+        'utime': round(rusage.ru_utime, 3),
+        'stime': round(rusage.ru_stime, 3),
+        'maxrss': maxrss,
+        'inblock': rusage.ru_inblock,
+        'oublock': rusage.ru_oublock,
+    }
+
+def waitstatus_to_exitcode(status):
+    """Convert a wait status to an exit code, or to minus the signal that killed the process"""
+    if hasattr(os, 'waitstatus_to_exitcode'):
+        return os.waitstatus_to_exitcode(status)
+    # Python < 3.9
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+def _reap(proc, options=0):
+    pid, status, rusage = os.wait4(proc.pid, options)
+    if pid == 0:
+        return None
+    proc.returncode = waitstatus_to_exitcode(status)
+    return proc.returncode, get_usage(rusage)
+
+def wait_for_process(proc):
+    """Wait for a subprocess.Popen to exit, and return its exit code and resource usage"""
+    try:
+        return _reap(proc)
+    except BaseException:
+        # Don't leave the task running if the worker is interrupted
+        proc.kill()
+        _reap(proc)
+        raise
+
+async def wait_for_process_async(proc, poll_interval=0.1):
+    """Asynchronous version of wait_for_process, for use from an event loop"""
+    loop = asyncio.get_running_loop()
+    try:
+        pidfd = os.pidfd_open(proc.pid)
+    except (AttributeError, OSError):
+        pidfd = None
+    if pidfd is not None:
+        # The pidfd becomes readable when the process exits
+        exited = loop.create_future()
+        loop.add_reader(pidfd, lambda: exited.done() or exited.set_result(None))
+        try:
+            await exited
+        finally:
+            loop.remove_reader(pidfd)
+            os.close(pidfd)
+        return _reap(proc)
+    result = _reap(proc, os.WNOHANG)
+    while result is None:
+        await asyncio.sleep(poll_interval)
+        result = _reap(proc, os.WNOHANG)
+    return result
+
+def get_allowed_cpus():
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count()))
+
+def apply_allocation(cpus, mem_bytes):
+    """Pin the current process to cpus, and limit its address space to mem_bytes (if not None)"""
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+    if mem_bytes is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (mem_bytes, mem_bytes))
+
+class ResourceScheduler:
+    """Hands out disjoint CPU sets and memory reservations to local tasks
+
+    With pin_cpus, each task is pinned to its own set of cpus_per_task cores, and waits until
+    that many cores are free. With mem_admission, a task is only started once its memory
+    reservation fits alongside the running tasks, both in the memory that was available when the
+    scheduler started and in the memory available right now. With mem_limit, each task's address
+    space is limited to its reservation (RLIMIT_AS). A task is always admitted if nothing else is
+    running, so oversized tasks still run (one at a time).
+
+    With host_slots (a HostSlots), each task also waits for cpus_per_task CPU slots (and, with
+    mem_admission, its reservation in 1 GB memory slots) shared with the other launches on the
+    host, and pinned tasks are pinned to the cores of their CPU slots.
+    """
+    def __init__(self, cpus_per_task=1, mem_per_task=0, pin_cpus=False, mem_admission=False,
+                 mem_limit=False, host_slots=None):
+        self.free_cpus = get_allowed_cpus()
+        self.cpus_per_task = max(1, min(cpus_per_task, len(self.free_cpus)))
+        self.mem_per_task = int(mem_per_task * GB)
+        self.pin_cpus = pin_cpus and hasattr(os, 'sched_setaffinity')
+        self.mem_admission = mem_admission and self.mem_per_task > 0
+        self.mem_limit = mem_limit and resource is not None and self.mem_per_task > 0
+        self.mem_budget = get_available_memory() if self.mem_admission else None
+        self.mem_reserved = 0
+        self.n_running = 0
+        self.host_slots = host_slots
+        self._condition = None
+
+    @property
+    def enabled(self):
+        return self.pin_cpus or self.mem_admission or self.mem_limit or self.host_slots is not None
+
+    def get_mem_slots(self):
+        return math.ceil(self.mem_per_task / GB) if self.mem_admission else 0
+
+    def can_admit(self):
+        if self.n_running == 0:
+            return True
+        # With host slots, the cores to pin to are handed out by the host slots instead
+        if (self.pin_cpus and self.host_slots is None
+                and len(self.free_cpus) < self.cpus_per_task):
+            return False
+        if self.mem_admission and self.mem_budget is not None:
+            if self.mem_reserved + self.mem_per_task > self.mem_budget:
+                return False
+            available = get_available_memory()
+            if available is not None and available < self.mem_per_task:
+                return False
+        return True
+
+    async def acquire(self):
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            await self._condition.wait_for(self.can_admit)
+            cpus = None
+            if self.pin_cpus and self.host_slots is None:
+                cpus = self.free_cpus[:self.cpus_per_task]
+                self.free_cpus = self.free_cpus[self.cpus_per_task:]
+            self.mem_reserved += self.mem_per_task
+            self.n_running += 1
+        allocation = Allocation(cpus, self.mem_per_task)
+        if self.host_slots is not None:
+            try:
+                slots = await self.host_slots.acquire(self.cpus_per_task, self.get_mem_slots())
+            except BaseException:
+                await self.release(allocation)
+                raise
+            allocation = Allocation(slots.cpus if self.pin_cpus else None, self.mem_per_task,
+                                    slots)
+        return allocation
+
+    async def release(self, allocation):
+        if allocation.host_slots is not None:
+            self.host_slots.release(allocation.host_slots)
+        async with self._condition:
+            if allocation.cpus is not None and allocation.host_slots is None:
+                self.free_cpus = sorted(self.free_cpus + allocation.cpus)
+            self.mem_reserved -= allocation.mem_bytes
+            self.n_running -= 1
+            self._condition.notify_all()
+
+    def get_preexec_fn(self, allocation):
+        """Return a function that applies the allocation to a child process before it starts"""
+        if not (self.pin_cpus or self.mem_limit):
+            return None
+        # A partial (rather than a closure) can be pickled, e.g. to send to a fork server
+        return partial(apply_allocation, allocation.cpus if self.pin_cpus else None,
+                       allocation.mem_bytes if self.mem_limit else None)
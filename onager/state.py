@@ -0,0 +1,202 @@
+from collections import Counter, namedtuple
+from datetime import datetime
+import glob
+import json
+import os
+import socket
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from .constants import default_state_folder
+from .taskset import TaskSet
+
+# Task states, in the order that a task passes through them
+QUEUED = 'queued'
+RUNNING = 'running'
+EXITED = 'exited'
+SIGNALED = 'signaled'
+
+STATE_FILE_EXT = '.jsonl'
+
+TaskState = namedtuple('TaskState', ['task_id', 'state', 'returncode', 'host', 'start', 'end',
+                                     'n_failures', 'usage'],
+                       defaults=[None, None, None, None, 0, None])
+
+def get_state_dir(jobid):
+    return os.path.join(default_state_folder, str(jobid))
+
+def get_hostname():
+    return socket.gethostname().replace('.local', '')
+
+class StateRecorder:
+    """Appends the state transitions of a job's tasks to this host's record file
+
+    Each host writes to its own file (.onager/state/<jobid>/<hostname>.jsonl), one JSON object per
+    line. Appends are made under an exclusive lock, since several workers can share a host.
+    """
+    def __init__(self, jobid, host=None):
+        self.jobid = str(jobid)
+        self.host = get_hostname() if host is None else host
+        state_dir = get_state_dir(self.jobid)
+        os.makedirs(state_dir, exist_ok=True)
+        self.path = os.path.join(state_dir, self.host + STATE_FILE_EXT)
+        self._file = None
+
+    def _append(self, record):
+        if self._file is None:
+            self._file = open(self.path, 'a')
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+        if fcntl is not None:
+            fcntl.lockf(self._file, fcntl.LOCK_EX)
+        try:
+            self._file.write(line)
+            self._file.flush()
+        finally:
+            if fcntl is not None:
+                fcntl.lockf(self._file, fcntl.LOCK_UN)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def record_queued(self, tasklist, failures=None, native=False):
+        """Record that the tasks in tasklist (a TaskSet or tasklist string) were submitted
+
+        For resumed jobs, failures maps task_ids to the number of times they previously failed.
+        Tasks run by the native wrapper (which records nothing else) are marked as such.
+        """
+        record = {'tasks': str(tasklist), 'state': QUEUED, 'time': time.time()}
+        if failures:
+            record['failures'] = {str(task_id): n for task_id, n in failures.items()}
+        if native:
+            record['wrapper'] = 'native'
+        self._append(record)
+
+    def record_running(self, task_id):
+        """Record that a task has started, and return its start time"""
+        start = time.time()
+        self._append({'task': task_id, 'state': RUNNING, 'time': start, 'host': self.host})
+        return start
+
+    def record_finished(self, task_id, returncode, start=None, usage=None):
+        """Record a task's exit code, or the signal that killed it (for negative returncodes)
+
+        If provided, usage is a dict of the task's resource usage (see resources.get_usage).
+        """
+        if returncode is not None and returncode < 0:
+            record = {'task': task_id, 'state': SIGNALED, 'signal': -returncode}
+        else:
+            record = {'task': task_id, 'state': EXITED, 'returncode': returncode}
+        record.update(time=time.time(), host=self.host, start=start)
+        if usage is not None:
+            record['usage'] = usage
+        self._append(record)
+
+def iter_state_records(jobid):
+    """Yield every record for the specified job, from all hosts"""
+    for path in sorted(glob.glob(os.path.join(get_state_dir(jobid), '*' + STATE_FILE_EXT))):
+        with open(path, 'r') as state_file:
+            for line in state_file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # A partially-written line from a worker that was killed mid-write
+                    continue
+
+def load_task_states(jobid):
+    """Return a dict mapping each known task_id to its most recent TaskState"""
+    states = {}
+    queued = TaskSet()
+    failures = Counter()
+    for record in iter_state_records(jobid):
+        if record['state'] == QUEUED:
+            queued = queued | TaskSet.from_string(record['tasks'])
+            failures.update({int(task_id): n for task_id, n in record.get('failures', {}).items()})
+            continue
+        task_id = record['task']
+        if record['state'] == SIGNALED or record.get('returncode', 0) != 0:
+            failures[task_id] += 1
+        previous = states.get(task_id)
+        if previous is not None and (previous.end or previous.start or 0) > record['time']:
+            continue
+        if record['state'] == RUNNING:
+            states[task_id] = TaskState(task_id, RUNNING, host=record['host'],
+                                        start=record['time'])
+        else:
+            returncode = record.get('returncode')
+            if record['state'] == SIGNALED:
+                returncode = -record['signal']
+            states[task_id] = TaskState(task_id, record['state'], returncode, record['host'],
+                                        record.get('start'), record['time'],
+                                        usage=record.get('usage'))
+    for task_id in queued - TaskSet.from_ids(states.keys()):
+        states[task_id] = TaskState(task_id, QUEUED)
+    for task_id, n_failures in failures.items():
+        if task_id in states:
+            states[task_id] = states[task_id]._replace(n_failures=n_failures)
+    return states
+
+def load_queued_times(jobid):
+    """Return a list of (time, TaskSet) pairs, for when each set of the job's tasks was queued"""
+    return [(record['time'], TaskSet.from_string(record['tasks']))
+            for record in iter_state_records(jobid) if record['state'] == QUEUED]
+
+def is_native_job(jobid):
+    """Return whether any of a job's tasks were run by the native wrapper"""
+    return any(record['state'] == QUEUED and record.get('wrapper') == 'native'
+               for record in iter_state_records(jobid))
+
+def get_completed_tasks(jobid):
+    task_states = load_task_states(jobid)
+    return TaskSet.from_ids(task_id for task_id, task_state in task_states.items()
+                            if is_completed(task_state))
+
+def get_resume_tasks(jobid, retry_failed=None):
+    """Return the TaskSet of a job's unfinished tasks, plus the failure counts of those tasks
+
+    Failed tasks are included unless they have already failed more than retry_failed times.
+    """
+    task_states = load_task_states(jobid)
+    if not task_states:
+        raise ValueError('No task states recorded for job {}'.format(jobid))
+    remaining = []
+    failures = {}
+    for task_id, task_state in task_states.items():
+        if is_completed(task_state):
+            continue
+        if is_failed(task_state) and retry_failed is not None:
+            if task_state.n_failures > retry_failed:
+                continue
+        remaining.append(task_id)
+        if task_state.n_failures:
+            failures[task_id] = task_state.n_failures
+    return TaskSet.from_ids(remaining), failures
+
+def is_completed(task_state):
+    return task_state.state == EXITED and task_state.returncode == 0
+
+def is_failed(task_state):
+    return task_state.state == SIGNALED or (task_state.state == EXITED
+                                            and task_state.returncode != 0)
+
+def summarize(task_states):
+    """Count the tasks that are queued, running, completed and failed"""
+    counts = Counter()
+    for task_state in task_states.values():
+        if is_completed(task_state):
+            counts['completed'] += 1
+        elif is_failed(task_state):
+            counts['failed'] += 1
+        else:
+            counts[task_state.state] += 1
+    return counts
+
+def format_time(timestamp):
+    if timestamp is None:
+        return ''
+    return datetime.fromtimestamp(timestamp).strftime('%Y.%m.%d %H:%M:%S')
@@ -0,0 +1,78 @@
+import math
+
+from tabulate import tabulate
+
+from .state import load_task_states, load_queued_times
+from .utils import load_jobindex_entry
+
+MB = 1024**2
+GB = 1024**3
+BLOCK_SIZE = 512 # ru_inblock/ru_oublock count 512-byte blocks
+# Headroom to add to the observed peaks when suggesting resource requests
+MEM_HEADROOM = 1.25
+DURATION_HEADROOM = 1.5
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of a sorted list"""
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+def get_queue_wait(task_state, queued_times):
+    """Time between the most recent submission of a task and the start of its latest run"""
+    waits = [task_state.start - queued_time for queued_time, taskset in queued_times
+             if queued_time <= task_state.start and task_state.task_id in taskset]
+    return min(waits) if waits else None
+
+def get_task_metrics(task_state, queued_times):
+    usage = task_state.usage
+    wall = task_state.end - task_state.start
+    cpu = usage['utime'] + usage['stime']
+    return {
+        'wall time (s)': wall,
+        'cpu time (s)': cpu,
+        'cpu utilization': cpu / wall if wall > 0 else 0.0,
+        'peak RSS (MB)': usage['maxrss'] / MB,
+        'read (MB)': usage['inblock'] * BLOCK_SIZE / MB,
+        'written (MB)': usage['oublock'] * BLOCK_SIZE / MB,
+        'queue wait (s)': get_queue_wait(task_state, queued_times),
+    }
+
+def format_duration(seconds):
+    minutes = max(1, math.ceil(seconds / 60))
+    days, minutes = divmod(minutes, 24 * 60)
+    hours, minutes = divmod(minutes, 60)
+    return '{}-{:02d}:{:02d}:00'.format(days, hours, minutes)
+
+def suggest_resources(distributions):
+    """Suggest per-task --cpus/--mem/--duration requests, based on the observed usage"""
+    cpus = max(1, math.ceil(percentile(distributions['cpu utilization'], 0.9)))
+    mem = max(1, math.ceil(distributions['peak RSS (MB)'][-1] * MB * MEM_HEADROOM / GB))
+    duration = format_duration(distributions['wall time (s)'][-1] * DURATION_HEADROOM)
+    return '--cpus {} --mem {} --duration {}'.format(cpus, mem, duration)
+
+def print_stats(args):
+    """Summarize the resource usage of a job's finished tasks, and suggest resource requests"""
+    entry = load_jobindex_entry(args.jobid)
+    task_states = load_task_states(args.jobid)
+    finished = [task_state for task_state in task_states.values()
+                if task_state.usage is not None and task_state.start is not None]
+    if not finished:
+        print('No resource usage recorded for job {}'.format(args.jobid))
+        return
+    queued_times = load_queued_times(args.jobid)
+    metrics = [get_task_metrics(task_state, queued_times) for task_state in finished]
+
+    distributions = {}
+    for name in metrics[0]:
+        values = sorted(m[name] for m in metrics if m[name] is not None)
+        if values:
+            distributions[name] = values
+
+    jobname = entry.jobname if entry is not None else '?'
+    print('Job {} ({}): resource usage of {} finished tasks'.format(args.jobid, jobname,
+                                                                    len(finished)))
+    rows = [(name, values[0], percentile(values, 0.5), percentile(values, 0.9), values[-1])
+            for name, values in distributions.items()]
+    print(tabulate(rows, headers=['', 'min', 'p50', 'p90', 'max'], floatfmt='.2f'))
+    print()
+    print('Suggested resources per task: {}'.format(suggest_resources(distributions)))
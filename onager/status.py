@@ -0,0 +1,63 @@
+import os
+
+from tabulate import tabulate
+
+from .state import (load_task_states, summarize, is_failed, is_native_job, format_time, QUEUED,
+                    RUNNING)
+from .constants import host_slots_folder
+from .utils import load_jobindex_entry
+
+STATUS_ORDER = ['completed', 'failed', RUNNING, QUEUED]
+
+def print_host_status():
+    """Summarize the slots held by --host-slots launches on this host, and list the queue"""
+    if not os.path.isdir(host_slots_folder):
+        print('No --host-slots launches on this host')
+        return
+    from .hostslots import HostSlots
+    host_slots = HostSlots()
+    try:
+        n_cpus, n_mem_slots = host_slots.count_held()
+        queue = host_slots.get_queue()
+    finally:
+        host_slots.close()
+    print('Host slots: {} of {} cpus, {} of {} GB in use'.format(
+        n_cpus, os.cpu_count(), n_mem_slots, host_slots.n_mem_slots))
+    print('Launches waiting for slots: {}'.format(len(queue)))
+    if queue:
+        rows = [(ticket.label, ticket.pid, ticket.cpus, ticket.mem, format_time(ticket.time))
+                for ticket in queue]
+        print(tabulate(rows, headers=['jobname', 'pid', 'cpus', 'mem (GB)', 'waiting since']))
+
+def print_status(args):
+    """Summarize the recorded task states for a job, and list its failed tasks"""
+    if args.host:
+        print_host_status()
+        if args.jobid is None:
+            return
+        print()
+    elif args.jobid is None:
+        raise ValueError('Either --jobid or --host is required')
+    entry = load_jobindex_entry(args.jobid)
+    task_states = load_task_states(args.jobid)
+    if not task_states:
+        print('No task states recorded for job {}'.format(args.jobid))
+        return
+    jobname = entry.jobname if entry is not None else '?'
+    print('Job {} ({}): {} tasks'.format(args.jobid, jobname, len(task_states)))
+    counts = summarize(task_states)
+    print(tabulate([(state, counts[state]) for state in STATUS_ORDER]))
+    if is_native_job(args.jobid):
+        print('Note: tasks run with --wrapper native only have their queued state recorded')
+
+    failures = sorted(
+        (task_state for task_state in task_states.values() if is_failed(task_state)),
+        key=lambda task_state: task_state.task_id)
+    if args.limit is not None:
+        failures = failures[:args.limit]
+    if failures:
+        print()
+        rows = [(task_state.task_id, task_state.state, task_state.returncode, task_state.host,
+                 format_time(task_state.start), format_time(task_state.end))
+                for task_state in failures]
+        print(tabulate(rows, headers=['task_id', 'state', 'returncode', 'host', 'start', 'end']))
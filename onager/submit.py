@@ -0,0 +1,73 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import re
+import subprocess
+import sys
+import threading
+import time
+
+# Scheduler errors that are worth retrying (e.g. a busy slurmctld or qmaster)
+TRANSIENT_ERRORS = re.compile(
+    r'timed? ?out|temporarily|try again|unable to contact|connection refused|'
+    r'resource busy|too many requests|communication',
+    re.IGNORECASE)
+BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 30.0
+
+SubmitResult = namedtuple('SubmitResult', ['cmd', 'output', 'error'])
+
+class RateLimiter:
+    """Spaces out calls to acquire() so that there are at most max_rate per second"""
+    def __init__(self, max_rate):
+        self.interval = 1.0 / max_rate if max_rate > 0 else 0
+        self.next_time = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.interval == 0:
+            return
+        with self.lock:
+            now = time.monotonic()
+            wait = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+def is_transient(error_output):
+    return TRANSIENT_ERRORS.search(error_output) is not None
+
+def submit_command(cmd, rate_limiter, max_retries):
+    """Run a submission command, retrying transient errors with exponential backoff"""
+    for attempt in range(max_retries + 1):
+        rate_limiter.acquire()
+        try:
+            proc = subprocess.run(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except OSError as err:
+            return SubmitResult(cmd, None, str(err))
+        stdout = proc.stdout.decode('utf-8')
+        stderr = proc.stderr.decode('utf-8')
+        if proc.returncode == 0:
+            # Pass along any warnings from the scheduler
+            sys.stderr.write(stderr)
+            return SubmitResult(cmd, stdout, None)
+        error = stderr.strip() or 'Command exited with status {}'.format(proc.returncode)
+        if attempt == max_retries or not is_transient(stderr):
+            return SubmitResult(cmd, None, error)
+        time.sleep(min(BACKOFF_SECONDS * 2**attempt, MAX_BACKOFF_SECONDS))
+
+def parse_jobid(output):
+    """Return the job ID printed by a submission command, or None if it can't be found"""
+    # Strip the GridEngine task range (jobid.1-10:1) or Slurm cluster (jobid;cluster)
+    jobid = output.replace('\n','').split('.')[0].split(';')[0]
+    return jobid if re.fullmatch(r'\w+', jobid) else None
+
+def submit_commands(cmds, max_workers=4, max_rate=0, max_retries=3):
+    """Run submission commands concurrently, and return their SubmitResults in the same order
+
+    At most max_workers commands run at once, and at most max_rate start per second (unlimited
+    if max_rate <= 0). Failures are returned as results, rather than raised, so that callers
+    can still record every submission that succeeded.
+    """
+    rate_limiter = RateLimiter(max_rate)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        return list(executor.map(lambda cmd: submit_command(cmd, rate_limiter, max_retries), cmds))
@@ -0,0 +1,113 @@
+from itertools import product
+
+from .constants import SEP, WSEP, FLAG_ON, FLAG_OFF
+
+def get_tag_keyname(key):
+    return key.replace('_', '').replace('-', '').replace('=','_').replace('/','.')
+
+class SweepSpec:
+    """Factored description of the cartesian product of a set of argument values
+
+    Command i is rebuilt on demand by mixed-radix decoding of i, where positional args vary
+    fastest, followed by optional args and then flags (each flag is ON before it is OFF).
+    """
+    def __init__(self, base_cmd, var_sep=' ', pos_args=None, args=None, flags=None, tag=None,
+                 tag_args=None, jobname='', tag_number=True, start_id=1):
+        self.base_cmd = base_cmd
+        self.var_sep = var_sep
+        self.pos_args = [list(values) for values in (pos_args or [])]
+        self.args = [[key, list(values)] for key, values in (args or [])]
+        self.flags = list(flags or [])
+        self.tag = tag
+        self.tag_args = list(tag_args) if tag_args is not None else [key for key, _ in self.args]
+        self.jobname = jobname
+        self.tag_number = tag_number
+        self.start_id = start_id
+        self._dims = self._compute_dims()
+        self._len = 1
+        for cmd_pieces, _ in self._dims:
+            self._len *= len(cmd_pieces)
+        n_digits = len(str(self.start_id + self._len - 1))
+        self._tag_number_format = '{{:0{0}d}}'.format(n_digits)
+
+    def _compute_dims(self):
+        # Each dimension is a pair of lists: (command pieces, tag pieces)
+        dims = []
+        for value_list in self.pos_args:
+            dims.append(([' ' + v for v in value_list], [WSEP + v for v in value_list]))
+        for key, value_list in self.args:
+            use_tag = (key in self.tag_args)
+            keyname = get_tag_keyname(key)
+            if len(value_list) > 0:
+                cmd_pieces = [' ' + key + self.var_sep + v for v in value_list]
+                tag_pieces = [(WSEP + keyname + SEP + v) if use_tag else '' for v in value_list]
+            else:
+                cmd_pieces = [' ' + key]
+                tag_pieces = [(WSEP + keyname) if use_tag else '']
+            dims.append((cmd_pieces, tag_pieces))
+        for flag in self.flags:
+            flagname = flag.replace(FLAG_OFF, '').replace(FLAG_ON, '')
+            dims.append(([' ' + flag, ''], [WSEP + s + flagname for s in [FLAG_ON, FLAG_OFF]]))
+        return dims
+
+    def __len__(self):
+        return self._len
+
+    def __contains__(self, task_id):
+        return self.start_id <= task_id < self.start_id + self._len
+
+    @property
+    def stop_id(self):
+        return self.start_id + self._len
+
+    def make_record(self, task_id, cmd_pieces, tag_pieces):
+        cmd = self.base_cmd + ''.join(cmd_pieces)
+        if self.tag is None:
+            return cmd, ''
+        tag = self.jobname
+        if self.tag_number:
+            tag += SEP + self._tag_number_format.format(task_id)
+        tag += ''.join(tag_pieces)
+        return cmd + ' ' + self.tag + self.var_sep + tag, tag
+
+    def get_record(self, task_id):
+        """Decode the (command, tag) record for the specified task id"""
+        if task_id not in self:
+            raise KeyError(task_id)
+        remainder = task_id - self.start_id
+        cmd_pieces, tag_pieces = [], []
+        for dim_cmd_pieces, dim_tag_pieces in self._dims:
+            remainder, digit = divmod(remainder, len(dim_cmd_pieces))
+            cmd_pieces.append(dim_cmd_pieces[digit])
+            tag_pieces.append(dim_tag_pieces[digit])
+        return self.make_record(task_id, cmd_pieces, tag_pieces)
+
+    def iter_records(self):
+        """Lazily yield (task_id, command, tag) for every point in the sweep, in task id order"""
+        # itertools.product varies its last iterable fastest, so we feed it the dimensions in
+        # reverse order and then un-reverse each combination of pieces
+        dim_indices = [range(len(cmd_pieces)) for cmd_pieces, _ in reversed(self._dims)]
+        for task_id, digits in enumerate(product(*dim_indices), self.start_id):
+            cmd_pieces, tag_pieces = [], []
+            for (dim_cmd_pieces, dim_tag_pieces), digit in zip(self._dims, reversed(digits)):
+                cmd_pieces.append(dim_cmd_pieces[digit])
+                tag_pieces.append(dim_tag_pieces[digit])
+            yield (task_id, *self.make_record(task_id, cmd_pieces, tag_pieces))
+
+    def to_dict(self):
+        return {
+            'base_cmd': self.base_cmd,
+            'var_sep': self.var_sep,
+            'pos_args': self.pos_args,
+            'args': self.args,
+            'flags': self.flags,
+            'tag': self.tag,
+            'tag_args': self.tag_args,
+            'jobname': self.jobname,
+            'tag_number': self.tag_number,
+            'start_id': self.start_id,
+        }
+
+    @classmethod
+    def from_dict(cls, spec):
+        return cls(**spec)
@@ -0,0 +1,258 @@
+from bisect import bisect_right
+from itertools import chain
+from math import gcd
+
+def _make_range(first, last, step=1):
+    """Canonical range for the progression first, first+step, ..., last"""
+    return range(first, last + 1, step if last > first else 1)
+
+def _normalize(rng):
+    return _make_range(rng[0], rng[-1], rng.step) if rng else rng
+
+def _modinv(a, m):
+    """Modular inverse of a (mod m), for coprime a and m"""
+    old_r, r, old_s, s = a, m, 1, 0
+    while r != 0:
+        quotient = old_r // r
+        old_r, r = r, old_r - quotient * r
+        old_s, s = s, old_s - quotient * s
+    return old_s % m
+
+def _can_join(r1, r2):
+    gap = r2[0] - r1[-1]
+    steps_match = (len(r1) == 1 or r1.step == gap) and (len(r2) == 1 or r2.step == gap)
+    # Don't join two isolated ids into a strided range (e.g. 1,5 -> 1-5:4)
+    return steps_match and (gap == 1 or len(r1) > 1 or len(r2) > 1)
+
+def _join_ranges(ranges):
+    """Merge consecutive ranges that continue the same progression"""
+    joined = []
+    for rng in ranges:
+        if not rng:
+            continue
+        if joined and _can_join(joined[-1], rng):
+            joined[-1] = range(joined[-1][0], rng[-1] + 1, rng[0] - joined[-1][-1])
+        else:
+            joined.append(_normalize(rng))
+    return joined
+
+def _ranges_from_ids(sorted_ids):
+    """Greedily group sorted, unique ids into progressions of length >= 3 (or runs of 1-step ids)"""
+    ranges = []
+    first, step, count, last = None, 1, 0, None
+    for id_ in sorted_ids:
+        if count == 0:
+            first, count = id_, 1
+        elif count == 1:
+            step, count = id_ - first, 2
+        elif id_ - last == step:
+            count += 1
+        elif count == 2 and step != 1:
+            ranges.append(_make_range(first, first))
+            first, step = last, id_ - last
+        else:
+            ranges.append(_make_range(first, last, step))
+            first, count = id_, 1
+        last = id_
+    if count == 2 and step != 1:
+        ranges.extend([_make_range(first, first), _make_range(last, last)])
+    elif count > 0:
+        ranges.append(_make_range(first, last, step))
+    return ranges
+
+# Set operations on the progressions a and b, which have both been clipped to the window [lo, hi).
+# Each returns a list of sorted, non-overlapping ranges. They take O(1) time, except when the
+# result can't be written as a single progression (e.g. the union of two progressions with
+# different strides), where they fall back to enumerating the ids within the window.
+
+def _window_intersection(a, b, lo, hi):
+    if not a or not b:
+        return []
+    g = gcd(a.step, b.step)
+    diff = b[0] - a[0]
+    if diff % g != 0:
+        return []
+    lcm = a.step // g * b.step
+    m = b.step // g
+    t = (diff // g) * _modinv(a.step // g, m) % m if m > 1 else 0
+    x0 = a[0] + a.step * t
+    return [range(lo + (x0 - lo) % lcm, hi, lcm)]
+
+def _is_subset(a, b):
+    return a.step % b.step == 0 and (a[0] - b[0]) % b.step == 0
+
+def _window_union(a, b, lo, hi):
+    if not a or not b:
+        return [a or b]
+    if _is_subset(a, b):
+        return [b]
+    if _is_subset(b, a):
+        return [a]
+    return _ranges_from_ids(sorted(set(a) | set(b)))
+
+def _window_difference(a, b, lo, hi):
+    if not a or not b:
+        return [a]
+    intersection = _window_intersection(a, b, lo, hi)
+    if not intersection or not intersection[0]:
+        return [a]
+    stride = intersection[0].step
+    if stride == a.step:
+        return []
+    if stride == 2 * a.step:
+        start = a[0] + a.step if a[0] in intersection[0] else a[0]
+        return [range(start, hi, stride)]
+    return _ranges_from_ids(x for x in a if x not in b)
+
+class TaskSet:
+    """Set of task ids, stored as sorted ranges (start, stop, step) with non-overlapping spans
+
+    Membership, length, set operations and chunking cost O(number of ranges) rather than
+    O(number of tasks), so tasklists like '1-1000000' are never expanded into lists.
+    """
+    def __init__(self, ranges=()):
+        # ranges must be sorted, with non-overlapping spans (use union to combine arbitrary sets)
+        self.ranges = _join_ranges(ranges)
+        self._offsets = [0]
+        for rng in self.ranges:
+            self._offsets.append(self._offsets[-1] + len(rng))
+        self._starts = [rng[0] for rng in self.ranges]
+
+    @classmethod
+    def from_ids(cls, ids):
+        return cls(_ranges_from_ids(sorted(set(ids))))
+
+    @classmethod
+    def from_string(cls, tasklist):
+        """Parse a comma separated list of task ID ranges (e.g. '18-22:1,26,29,34-49:3,51')"""
+        taskset = cls()
+        blocks = []
+        for task_block in tasklist.split(','):
+            if ':' in task_block:
+                task_block, step = task_block.split(':')
+                step = int(step)
+            else:
+                step = 1
+            if '-' in task_block:
+                first, last = map(int, task_block.split('-'))
+            else:
+                first = int(task_block)
+                last = first
+            rng = _normalize(range(first, last + 1, step))
+            if not rng:
+                continue
+            if blocks and blocks[-1][-1] >= rng[0]:
+                # blocks are out of order or overlapping, so merge them with a proper union
+                taskset = taskset | cls(blocks)
+                blocks = []
+            blocks.append(rng)
+        return taskset | cls(blocks) if taskset else cls(blocks)
+
+    def __len__(self):
+        return self._offsets[-1]
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __iter__(self):
+        return chain.from_iterable(self.ranges)
+
+    def __contains__(self, task_id):
+        i = bisect_right(self._starts, task_id) - 1
+        return i >= 0 and task_id in self.ranges[i]
+
+    def __getitem__(self, index):
+        """Return the task id at the specified position, in sorted order"""
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('TaskSet index out of range')
+        i = bisect_right(self._offsets, index) - 1
+        return self.ranges[i][index - self._offsets[i]]
+
+    def __eq__(self, other):
+        if not isinstance(other, TaskSet):
+            return NotImplemented
+        return len(self) == len(other) and not (self - other)
+
+    def __repr__(self):
+        return 'TaskSet({!r})'.format(str(self))
+
+    def __str__(self):
+        return self.to_slurm()
+
+    def _combine(self, other, window_op):
+        """Apply window_op to each window between consecutive range boundaries of both sets"""
+        breakpoints = sorted(
+            set(rng[0] for rng in chain(self.ranges, other.ranges))
+            | set(rng[-1] + 1 for rng in chain(self.ranges, other.ranges)))
+        result = []
+        i, j = 0, 0
+        for lo, hi in zip(breakpoints[:-1], breakpoints[1:]):
+            while i < len(self.ranges) and self.ranges[i][-1] < lo:
+                i += 1
+            while j < len(other.ranges) and other.ranges[j][-1] < lo:
+                j += 1
+            a = self._clip(self.ranges, i, lo, hi)
+            b = self._clip(other.ranges, j, lo, hi)
+            result.extend(rng for rng in window_op(a, b, lo, hi) if rng)
+        return TaskSet(result)
+
+    @staticmethod
+    def _clip(ranges, i, lo, hi):
+        if i >= len(ranges) or ranges[i][0] > lo:
+            return range(0)
+        rng = ranges[i]
+        return range(lo + (rng[0] - lo) % rng.step, hi, rng.step)
+
+    def union(self, other):
+        return self._combine(other, _window_union)
+
+    def intersection(self, other):
+        return self._combine(other, _window_intersection)
+
+    def difference(self, other):
+        return self._combine(other, _window_difference)
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+
+    def shift(self, delta):
+        """Return a new TaskSet with delta added to every task id"""
+        return TaskSet([range(rng.start + delta, rng.stop + delta, rng.step) for rng in self.ranges])
+
+    def slice(self, start, stop):
+        """Return the tasks at positions [start, stop) as a new TaskSet"""
+        start, stop = max(start, 0), min(stop, len(self))
+        ranges = []
+        i = bisect_right(self._offsets, start) - 1
+        while start < stop:
+            rng = self.ranges[i]
+            offset = self._offsets[i]
+            ranges.append(rng[start - offset:stop - offset])
+            start = self._offsets[i + 1]
+            i += 1
+        return TaskSet(ranges)
+
+    def chunks(self, chunk_size):
+        """Yield consecutive TaskSets of chunk_size tasks each (the last one may be smaller)"""
+        for start in range(0, len(self), chunk_size):
+            yield self.slice(start, start + chunk_size)
+
+    @staticmethod
+    def _format_range(rng):
+        if len(rng) == 1:
+            return str(rng[0])
+        elif rng.step == 1:
+            return '{}-{}'.format(rng[0], rng[-1])
+        else:
+            return '{}-{}:{}'.format(rng[0], rng[-1], rng.step)
+
+    def to_slurm(self):
+        """Format as a Slurm array specification (e.g. '1-5,7,9-15:2')"""
+        return ','.join(self.to_gridengine())
+
+    def to_gridengine(self):
+        """Format as a list of GridEngine task ranges, one for each 'qsub -t' (e.g. ['9-15:2'])"""
+        return [self._format_range(rng) for rng in self.ranges]
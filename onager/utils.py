@@ -1,10 +1,11 @@
+from collections import namedtuple
 import csv
-from itertools import count, groupby
-import json
 import os
 import sys
 
-from . import constants
+from . import constants, indexdb
+from .jobfile import Jobfile, write_jobfile
+from .taskset import TaskSet
 
 def ensure_onager_folders_exist():
     if not os.path.isdir(constants.onager_folder):
@@ -35,29 +36,107 @@ def cpu_count():
     except AttributeError:
         return os.cpu_count()
 
+def get_jobfile_path(jobfile, jobname):
+    jobfile_path = jobfile.format(jobname=jobname)
+    if jobfile == constants.defaultjobfile and not os.path.exists(jobfile_path):
+        # fall back to the jobs.json file written by older versions of onager
+        legacy_jobfile_path = constants.legacy_defaultjobfile.format(jobname=jobname)
+        if os.path.exists(legacy_jobfile_path):
+            return legacy_jobfile_path
+    return jobfile_path
+
 def load_jobfile(jobfile_path):
-    with open(jobfile_path, 'r') as file:
-        job_records = json.load(file)
-    # json stores all keys as strings, so we convert to ints
-    jobs = {int(id_): record[0] for id_, record in job_records.items()}
-    tags = {int(id_): record[1] for id_, record in job_records.items()}
+    jobfile = Jobfile(jobfile_path)
+    jobs, tags = dict(), dict()
+    for id_ in jobfile:
+        jobs[id_], tags[id_] = jobfile.get_record(id_)
+    jobfile.close()
     return jobs, tags
 
 def save_jobfile(jobs, jobfile_path, tag=None):
-    with open(jobfile_path, "w+") as jobfile:
-        json.dump(jobs, jobfile)
+    records = ((id_, *jobs[id_]) for id_ in sorted(jobs.keys()))
+    write_jobfile(records, jobfile_path)
 
 def compute_subjobs_filename(jobfile_path):
     jobdir = os.path.dirname(jobfile_path)
     return os.path.join(jobdir, 'subjobs.csv')
 
+JobIndexEntry = namedtuple('JobIndexEntry',
+                           ['jobname', 'jobfile', 'backend', 'tasklist', 'task_offset'],
+                           defaults=[None, None, None])
+
 def load_index(index_name:str = constants.job_index):
+    if indexdb.is_supported(index_name):
+        return indexdb.load_index(index_name)
     with open(index_name, 'r', newline='') as index_file:
         csv_reader = csv.reader(index_file, delimiter=',', quotechar='|')
         index = {entry[0]: entry[1:] for entry in csv_reader}
     return index
 
+def load_index_entry(entry_id, index_name:str = constants.job_index):
+    if indexdb.is_supported(index_name):
+        try:
+            return indexdb.load_index_entry(int(entry_id), index_name)
+        except ValueError:
+            return None
+    return load_index(index_name).get(str(entry_id))
+
+def _parse_csv_line(line):
+    return next(csv.reader([line.decode('utf-8')], delimiter=',', quotechar='|'))
+
+def _get_line_start(index_file, position):
+    """Return the offset of the first line that starts at or after position"""
+    if position == 0:
+        return 0
+    index_file.seek(position - 1)
+    index_file.readline()
+    return index_file.tell()
+
+def _find_first_entry_after(index_file, since):
+    """Binary search a time-ordered CSV index for the first entry after since"""
+    lo, hi = 0, index_file.seek(0, os.SEEK_END)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        index_file.seek(_get_line_start(index_file, mid))
+        line = index_file.readline()
+        if line and tuple(_parse_csv_line(line)[1:3]) <= tuple(since):
+            lo = mid + 1
+        else:
+            hi = mid
+    return _get_line_start(index_file, lo)
+
+def _find_last_lines(index_file, n):
+    """Return the offset of the start of the last n lines of a file, reading backwards"""
+    end = index_file.seek(0, os.SEEK_END)
+    position, data = end, b''
+    while position > 0 and data.count(b'\n') <= n:
+        block_size = min(8192, position)
+        position -= block_size
+        index_file.seek(position)
+        data = index_file.read(block_size) + data
+    lines = data.splitlines(keepends=True)
+    return end - sum(len(line) for line in lines[-n:]) if n > 0 else end
+
+def load_recent_index_entries(index_name, n=None, since=None):
+    """Load the last n entries of an index with date and time columns (all, if n is None)
+
+    If since is a (date, time) pair, only entries after it are loaded. CSV indexes are read
+    from the end of the file, and binary searched for since, rather than parsed in full.
+    """
+    if indexdb.is_supported(index_name):
+        return indexdb.load_recent_index_entries(index_name, n, since)
+    with open(index_name, 'rb') as index_file:
+        start = 0 if since is None else _find_first_entry_after(index_file, since)
+        if n is not None:
+            start = max(start, _find_last_lines(index_file, n))
+        index_file.seek(start)
+        lines = index_file.read().decode('utf-8').splitlines()
+    csv_reader = csv.reader(lines, delimiter=',', quotechar='|')
+    return {entry[0]: entry[1:] for entry in csv_reader}
+
 def get_next_index_id(index_name:str = constants.job_index):
+    if indexdb.is_supported(index_name):
+        return indexdb.get_next_index_id(index_name)
     try:
         ids = load_index(index_name).keys()
     except IOError:
@@ -69,6 +148,12 @@ def get_next_index_id(index_name:str = constants.job_index):
     return next_id
 
 def update_index(entries, index_name:str, append=True):
+    if indexdb.is_supported(index_name):
+        indexdb.update_index(entries, index_name, append=append)
+        return
+    if any(entry[0] is None for entry in entries):
+        next_id = get_next_index_id(index_name)
+        entries = [(next_id, *entry[1:]) if entry[0] is None else entry for entry in entries]
     mode = 'w+' if not append else 'a+'
     with open(index_name, mode, newline='') as index_file:
         csv_writer = csv.writer(index_file, delimiter=',', quotechar='|')
@@ -78,37 +163,24 @@ def update_jobindex(entries, append=True):
     update_index(entries, index_name=constants.job_index, append=append)
 
 def load_jobindex():
-    return load_index(index_name=constants.job_index)
+    index = load_index(index_name=constants.job_index)
+    return {jobid: JobIndexEntry(*entry) for jobid, entry in index.items()}
+
+def load_jobindex_entry(jobid):
+    entry = load_index_entry(jobid, index_name=constants.job_index)
+    return None if entry is None else JobIndexEntry(*entry)
 
 def condense_ids(id_list):
-    G = (list(x) for _, x in groupby(id_list, lambda x, c=count(): next(c) - x))
-    return ",".join("-".join(map(str, (g[0], g[-1])[:len(g)])) for g in G)
+    return str(TaskSet.from_ids(id_list))
 
 def expand_ids(tasklist):
-    return [i for r in _generate_id_ranges(tasklist) for i in r]
-
-def _generate_id_ranges(tasklist):
-    task_blocks = tasklist.split(',')
-    for task_block in task_blocks:
-        if ':' in task_block:
-            task_block, step = task_block.split(':')
-            step = int(step)
-        else:
-            step = 1
-        if '-' in task_block:
-            first, last = map(int, task_block.split('-'))
-        else:
-            first = int(task_block)
-            last = first
-        yield range(first, last + 1, step)
+    return list(TaskSet.from_string(tasklist))
 
 def insert_second_to_last(cmd, insert_str, sep=' '):
     cmd = cmd.split(sep)
     return sep.join(cmd[:-1]) + sep + insert_str + sep + cmd[-1]
 
 def split_tasklist_into_subjob_groups(tasklist, tasks_per_node):
-    jobids = expand_ids(tasklist)
-    list_of_tasklist_strings = [
-        condense_ids(jobids[i:i+tasks_per_node]) for i in range(0, len(jobids), tasks_per_node)
-    ]
+    taskset = TaskSet.from_string(tasklist)
+    list_of_tasklist_strings = [str(chunk) for chunk in taskset.chunks(tasks_per_node)]
     return list_of_tasklist_strings
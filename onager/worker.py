@@ -3,10 +3,29 @@ from datetime import datetime
 import subprocess
 import sys
 
-from .utils import load_jobfile
+from .cache import ResultCache
+from .jobfile import Jobfile
+from .resources import wait_for_process
+from .state import StateRecorder
 
-def run_command_by_id(commands, task_id, stdout=None, stderr=None, quiet=False):
-    cmd = commands[task_id]
+def run_command_by_id(commands, task_id, stdout=None, stderr=None, quiet=False, recorder=None,
+                      cache=None):
+    """Run the command for task_id, recording its state transitions if a recorder is provided,
+    and adding it to the result cache if one is provided and the command succeeds"""
+    start = recorder.record_running(task_id) if recorder is not None else None
+    returncode, usage = None, None
+    try:
+        returncode, usage = run_command(commands[task_id], stdout=stdout, stderr=stderr,
+                                        quiet=quiet)
+        if cache is not None and returncode == 0:
+            cache.add(commands[task_id], recorder.jobid if recorder is not None else None, task_id)
+    finally:
+        if recorder is not None:
+            recorder.record_finished(task_id, returncode, start, usage)
+    return returncode
+
+def run_command(cmd, stdout=None, stderr=None, quiet=False):
+    """Run a shell command, and return its exit code and resource usage"""
     if not quiet:
         print('Launching worker: {}'.format(cmd), flush=True)
         start_time = datetime.now()
@@ -14,20 +33,26 @@ def run_command_by_id(commands, task_id, stdout=None, stderr=None, quiet=False):
         stdout = stack.enter_context(open(stdout, 'wb')) if stdout is not None else None
         stderr = stack.enter_context(open(stderr, 'wb')) if stderr is not None else None
         try:
-            subprocess.call(cmd, shell=True, stdout=stdout, stderr=stderr)
+            proc = subprocess.Popen(cmd, shell=True, stdout=stdout, stderr=stderr)
+            returncode, usage = wait_for_process(proc)
         except:
             raise
         else:
             if not quiet:
                 elapsed = datetime.now() - start_time
                 print('Worker finished: {}\nElapsed time:  {}'.format(cmd, elapsed), flush=True)
+            return returncode, usage
 
 if __name__ == '__main__':
-    assert len(sys.argv) == 3, 'Usage: python -m worker path/to/commands.json task_id'
+    assert len(sys.argv) in [3, 4], 'Usage: python -m worker path/to/jobs.jsonl task_id [job_id]'
 
     commands_file = sys.argv[1]
     task_id = int(sys.argv[2])
+    recorder = StateRecorder(sys.argv[3]) if len(sys.argv) == 4 else None
 
-    commands = load_jobfile(commands_file)[0]
+    commands = Jobfile(commands_file)
 
-    run_command_by_id(commands, task_id)
+    returncode = run_command_by_id(commands, task_id, recorder=recorder,
+                                   cache=ResultCache.from_environment())
+    # Report the task's exit status to the backend, using the shell's 128+N for signal N
+    sys.exit(returncode if returncode >= 0 else 128 - returncode)
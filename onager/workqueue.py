@@ -0,0 +1,47 @@
+import os
+import struct
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+CURSOR_FILENAME = 'queue_{}.cursor'
+_CURSOR = struct.Struct('<Q')
+
+def get_cursor_path(subjobs_filename, subjob_group_id):
+    return os.path.join(os.path.dirname(subjobs_filename), CURSOR_FILENAME.format(subjob_group_id))
+
+class WorkQueue:
+    """Queue of task ids shared by every node that runs the same subjob group
+
+    The queue is a fixed TaskSet plus a cursor file on the shared filesystem, holding the position
+    of the next unclaimed task. Each node claims tasks one at a time by advancing the cursor under
+    an exclusive lock, so nodes keep pulling work until the whole group has been drained.
+    """
+    def __init__(self, taskset, cursor_path):
+        self.taskset = taskset
+        self.cursor_path = cursor_path
+
+    def claim(self):
+        """Advance the cursor and return its previous position"""
+        fd = os.open(self.cursor_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.lockf(fd, fcntl.LOCK_EX)
+            data = os.pread(fd, _CURSOR.size, 0)
+            position = _CURSOR.unpack(data)[0] if len(data) == _CURSOR.size else 0
+            if position < len(self.taskset):
+                os.pwrite(fd, _CURSOR.pack(position + 1), 0)
+                os.fsync(fd)
+            return position
+        finally:
+            # Closing the file also releases the lock
+            os.close(fd)
+
+    def __iter__(self):
+        while True:
+            position = self.claim()
+            if position >= len(self.taskset):
+                return
+            yield self.taskset[position]
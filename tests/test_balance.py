@@ -0,0 +1,32 @@
+import unittest
+
+from onager.balance import get_arg_values, get_expression_weights, pack_subjob_groups
+from onager.taskset import TaskSet
+
+class TestBalance(unittest.TestCase):
+    def test_arg_values(self):
+        values = get_arg_values("python train.py --batch-size 32 --lr 1e-3 --tag 'a b' --cuda -5")
+        self.assertEqual(values['batch_size'], 32)
+        self.assertEqual(values['lr'], 0.001)
+        self.assertEqual(values['tag'], 'a b')
+        self.assertEqual(values['cuda'], -5)
+        self.assertEqual(values['pos'], ['train.py'])
+
+    def test_lpt_packing(self):
+        taskset = TaskSet.from_string('1-8')
+        weights = {1: 8, 2: 7, 3: 6, 4: 5, 5: 4, 6: 3, 7: 2, 8: 1}
+        groups = pack_subjob_groups(taskset, 4, weights)
+        self.assertEqual(groups, ['1,4-5,8', '2-3,6-7'])
+        group_costs = [sum(weights[i] for i in TaskSet.from_string(g)) for g in groups]
+        self.assertEqual(group_costs, [18, 18])
+
+    def test_expression_weights(self):
+        jobfile = {1: 'python train.py --steps 100', 2: 'python train.py --steps 0'}
+        taskset = TaskSet.from_string('1-2')
+        self.assertEqual(get_expression_weights(jobfile, taskset, 'steps * 2'), {1: 200, 2: 0})
+        for expression in ['1 / steps', 'steps + "x"', 'epochs']:
+            with self.assertRaises(ValueError):
+                get_expression_weights(jobfile, taskset, expression)
+
+if __name__ == '__main__':
+    unittest.main()
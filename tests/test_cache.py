@@ -0,0 +1,47 @@
+import os
+import tempfile
+import time
+import unittest
+
+from onager.cache import ResultCache, get_fingerprint
+from onager.taskset import TaskSet
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmpdir.name, 'cache')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_filter_taskset(self):
+        cache = ResultCache(cache_dir=self.cache_dir)
+        commands = {1: 'echo 1', 2: 'echo 2', 3: 'echo 1', 4: 'echo 4'}
+        cache.add('echo 1')
+        remaining = cache.filter_taskset(commands, TaskSet.from_string('1-4'))
+        self.assertEqual(str(remaining), '2,4')
+        # Results are keyed by the exact command, and the input fingerprint
+        self.assertNotIn('echo 1 ', cache)
+        self.assertNotIn('echo 1', ResultCache('other', cache_dir=self.cache_dir))
+
+    def test_expiry(self):
+        cache = ResultCache(max_age=60, cache_dir=self.cache_dir)
+        cache.add('echo 1')
+        self.assertIn('echo 1', cache)
+        old = time.time() - 120
+        os.utime(cache.get_entry_path('echo 1'), (old, old))
+        self.assertNotIn('echo 1', cache)
+        self.assertFalse(os.path.exists(cache.get_entry_path('echo 1')))
+
+    def test_fingerprint(self):
+        path = os.path.join(self.tmpdir.name, 'data.csv')
+        with open(path, 'w') as file:
+            file.write('a')
+        fingerprint = get_fingerprint(paths=[path])
+        self.assertEqual(get_fingerprint(paths=[path]), fingerprint)
+        with open(path, 'w') as file:
+            file.write('ab')
+        self.assertNotEqual(get_fingerprint(paths=[path]), fingerprint)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,18 @@
+import os
+import tempfile
+import unittest
+
+from onager.engine import run_tasks
+
+class TestEngine(unittest.TestCase):
+    def test_task_errors_are_raised(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            missing_dir_log = os.path.join(tmpdir, 'missing', '2.o')
+            tasks = [(1, 'exit 0', None, None), (2, 'exit 0', missing_dir_log, None),
+                     (3, 'exit 0', None, None)]
+            with self.assertRaises(FileNotFoundError):
+                run_tasks(tasks, 1, quiet=True)
+            self.assertEqual(run_tasks(tasks[:1], 1, quiet=True), {1: 0})
+
+if __name__ == '__main__':
+    unittest.main()
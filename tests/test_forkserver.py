@@ -0,0 +1,106 @@
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+
+from onager.forkserver import ForkServer, parse_entry_point
+
+TASK_MODULE = textwrap.dedent("""\
+    import os
+    import sys
+
+    def main():
+        print(' '.join(sys.argv[1:]))
+        print(os.getpid(), file=sys.stderr)
+        return int(sys.argv[1])
+
+    def fail():
+        raise RuntimeError('task failed')
+
+    def exit():
+        sys.exit(int(sys.argv[1]))
+""")
+
+# Logs whether onager.logs had already been imported, each time it runs (in any process)
+MAIN_SCRIPT = textwrap.dedent("""\
+    import asyncio
+    import sys
+
+    already_imported = 'onager.logs' in sys.modules
+    import onager.logs
+    with open('imports.log', 'a') as log:
+        log.write('{} {}\\n'.format(__name__, already_imported))
+
+    from onager.forkserver import ForkServer
+
+    async def run_all(forkserver):
+        for _ in range(3):
+            await forkserver.run('onager_test_task:main 0')
+
+    if __name__ == '__main__':
+        asyncio.run(run_all(ForkServer(['onager_test_task'])))
+""")
+
+class TestForkServer(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.tmpdir.name, 'onager_test_task.py'), 'w') as file:
+            file.write(TASK_MODULE)
+        self.cwd = os.getcwd()
+        self.sys_path = list(sys.path)
+        os.chdir(self.tmpdir.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        sys.path[:] = self.sys_path
+        self.tmpdir.cleanup()
+
+    def read(self, filename):
+        with open(filename) as file:
+            return file.read()
+
+    def test_parse_entry_point(self):
+        module, function, argv = parse_entry_point("pkg.mod:main --name 'a b'")
+        self.assertEqual((module, function), ('pkg.mod', 'main'))
+        self.assertEqual(argv, ['pkg.mod:main', '--name', 'a b'])
+        for cmd in ['python train.py', 'mod:', ':main', '']:
+            with self.assertRaises(ValueError):
+                parse_entry_point(cmd)
+
+    def test_run(self):
+        forkserver = ForkServer(['onager_test_task'])
+        async def run_all():
+            return await asyncio.gather(
+                forkserver.run('onager_test_task:main 0 a', 'main.o', 'main.e'),
+                forkserver.run('onager_test_task:main 3 b', 'main3.o', 'main3.e'),
+                forkserver.run('onager_test_task:fail', 'fail.o', 'fail.e'),
+                forkserver.run('onager_test_task:exit 7', 'exit.o', 'exit.e'),
+                forkserver.run('onager_test_task:missing', 'missing.o', 'missing.e'),
+            )
+        results = asyncio.run(run_all())
+        self.assertEqual([returncode for returncode, _ in results], [0, 3, 1, 7, 1])
+        self.assertEqual(self.read('main.o'), '0 a\n')
+        self.assertEqual(self.read('main3.o'), '3 b\n')
+        # Each task runs in its own process
+        self.assertNotEqual(self.read('main.e'), self.read('main3.e'))
+        self.assertNotEqual(int(self.read('main.e')), os.getpid())
+        self.assertIn('RuntimeError: task failed', self.read('fail.e'))
+        self.assertIn('AttributeError', self.read('missing.e'))
+        self.assertIn('maxrss', results[0][1])
+
+    def test_main_module_imports_preloaded(self):
+        with open('main.py', 'w') as file:
+            file.write(MAIN_SCRIPT)
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in sys.path if p))
+        subprocess.run([sys.executable, 'main.py'], env=env, check=True,
+                       stdout=subprocess.DEVNULL)
+        lines = self.read('imports.log').splitlines()
+        self.assertEqual(lines[0], '__main__ False')
+        # Tasks that re-run the main module find its imports already loaded by the fork server
+        self.assertTrue(all(line == '__mp_main__ True' for line in lines[1:]))
+
+if __name__ == '__main__':
+    unittest.main()
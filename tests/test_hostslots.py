@@ -0,0 +1,87 @@
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import unittest
+
+from onager.hostslots import HostSlots
+
+def hold_slots(slots_dir, n_cpus, take_ticket, ready, done):
+    # Record locks belong to the process, so other launches have to be simulated in another one
+    host_slots = HostSlots('other', slots_dir)
+    host_slots.cpus = [0, 1]
+    host_slots.try_acquire(n_cpus)
+    if take_ticket:
+        host_slots.take_ticket(1, 0)
+    ready.set()
+    done.wait()
+
+class TestHostSlots(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.slots_dir = os.path.join(self.tmpdir.name, 'slots')
+        self.host_slots = HostSlots('test', self.slots_dir, poll_interval=0.01)
+        self.host_slots.cpus = [0, 1]
+        self.context = multiprocessing.get_context('fork')
+        self.done = self.context.Event()
+
+    def tearDown(self):
+        self.done.set()
+        self.host_slots.close()
+        self.tmpdir.cleanup()
+
+    def start_other_launch(self, n_cpus, take_ticket=False):
+        ready = self.context.Event()
+        proc = self.context.Process(target=hold_slots,
+                                    args=(self.slots_dir, n_cpus, take_ticket, ready, self.done))
+        proc.start()
+        ready.wait()
+        return proc
+
+    def test_shared_cpu_slots(self):
+        other = self.start_other_launch(1)
+        self.assertEqual(self.host_slots.count_held()[0], 1)
+        allocation = self.host_slots.try_acquire(1)
+        self.assertEqual(allocation.cpus, [1])
+        self.assertIsNone(self.host_slots.try_acquire(1))
+        # The other launch's slot is released when it exits
+        self.done.set()
+        other.join()
+        self.assertEqual(self.host_slots.try_acquire(1).cpus, [0])
+        self.host_slots.release(allocation)
+        self.assertEqual(self.host_slots.held_cpus, {0})
+
+    def test_queue(self):
+        other = self.start_other_launch(0, take_ticket=True)
+        queue = self.host_slots.get_queue()
+        self.assertEqual([(ticket.label, ticket.pid) for ticket in queue], [('other', other.pid)])
+
+        async def acquire():
+            return await asyncio.wait_for(self.host_slots.acquire(1), timeout=0.2)
+
+        # Slots are free, but an older ticket is waiting for them
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(acquire())
+        self.assertEqual(len(self.host_slots.get_queue()), 1)
+        # The tickets of exited processes are removed
+        self.done.set()
+        other.join()
+        self.assertEqual(asyncio.run(acquire()).cpus, [0])
+        self.assertEqual(self.host_slots.get_queue(), [])
+
+    def test_concurrent_waiters(self):
+        async def run_task():
+            allocation = await self.host_slots.acquire(1)
+            await asyncio.sleep(0.02)
+            self.host_slots.release(allocation)
+            return allocation.cpus
+
+        async def run_all():
+            tasks = asyncio.gather(*[run_task() for _ in range(5)])
+            return await asyncio.wait_for(tasks, timeout=5)
+
+        self.assertEqual(sorted(len(cpus) for cpus in asyncio.run(run_all())), [1] * 5)
+        self.assertEqual(self.host_slots.held_cpus, set())
+
+if __name__ == '__main__':
+    unittest.main()
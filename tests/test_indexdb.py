@@ -0,0 +1,94 @@
+import os
+import tempfile
+import unittest
+
+from onager import indexdb
+from onager.utils import get_next_index_id, load_index, load_recent_index_entries, update_index
+
+def make_history_entries(n):
+    return [(i, '2022.12.{:02d}'.format(i + 1), '11:52:06.184', 'exp', 'launch', 'n', '')
+            for i in range(n)]
+
+@unittest.skipIf(indexdb.sqlite3 is None, 'sqlite3 is not available')
+class TestSQLiteIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.history_index = os.path.join(self.tmpdir.name, 'history_index.csv')
+        self.job_index = os.path.join(self.tmpdir.name, 'job_index.csv')
+        self.enable_var = os.environ.get(indexdb.ENABLE_VAR)
+        os.environ[indexdb.ENABLE_VAR] = '1'
+
+    def tearDown(self):
+        if self.enable_var is None:
+            os.environ.pop(indexdb.ENABLE_VAR, None)
+        else:
+            os.environ[indexdb.ENABLE_VAR] = self.enable_var
+        self.tmpdir.cleanup()
+
+    def test_autoincrement_ids(self):
+        self.assertEqual(get_next_index_id(self.history_index), 0)
+        entry = (None, '2022.12.15', '11:52:06.184', 'exp', 'launch', 'n', '--jobname exp')
+        update_index([entry, entry], self.history_index)
+        self.assertEqual(list(load_index(self.history_index).keys()), ['0', '1'])
+        self.assertEqual(get_next_index_id(self.history_index), 2)
+
+    def test_csv_migration(self):
+        with open(self.job_index, 'w') as index_file:
+            index_file.write('13438569,exp1,.onager/scripts/exp1/jobs.json\n')
+            index_file.write('13438570,exp2,.onager/scripts/exp2/jobs.jsonl\n')
+        update_index([(0, 'exp3', '.onager/scripts/exp3/jobs.jsonl', 'myhost')], self.job_index)
+        index = load_index(self.job_index)
+        self.assertEqual(index['13438569'][:3], ['exp1', '.onager/scripts/exp1/jobs.json', None])
+        self.assertEqual(index['0'][:3], ['exp3', '.onager/scripts/exp3/jobs.jsonl', 'myhost'])
+        self.assertEqual(get_next_index_id(self.job_index), 13438571)
+        self.assertFalse(os.path.exists(self.job_index))
+        # The database stays in use once it exists
+        del os.environ[indexdb.ENABLE_VAR]
+        self.assertTrue(indexdb.is_supported(self.job_index))
+
+    def test_opt_in(self):
+        del os.environ[indexdb.ENABLE_VAR]
+        with open(self.job_index, 'w') as index_file:
+            index_file.write('13438569,exp1,.onager/scripts/exp1/jobs.jsonl\n')
+        update_index([(13438570, 'exp2', '.onager/scripts/exp2/jobs.jsonl')], self.job_index)
+        self.assertEqual(list(load_index(self.job_index)), ['13438569', '13438570'])
+        self.assertFalse(os.path.exists(indexdb.get_database_path(self.job_index)))
+
+    def test_add_missing_columns(self):
+        db_path = indexdb.get_database_path(self.job_index)
+        connection = indexdb.sqlite3.connect(db_path)
+        connection.execute('CREATE TABLE job_index (id INTEGER PRIMARY KEY, jobname TEXT, '
+                           'jobfile TEXT, backend TEXT)')
+        connection.execute("INSERT INTO job_index VALUES (5, 'exp', 'jobs.jsonl', 'slurm')")
+        connection.commit()
+        connection.close()
+        update_index([(6, 'exp', 'jobs.jsonl', 'slurm', '1-10', '1000')], self.job_index)
+        index = load_index(self.job_index)
+        self.assertEqual(index['5'], ['exp', 'jobs.jsonl', 'slurm', None, None])
+        self.assertEqual(index['6'], ['exp', 'jobs.jsonl', 'slurm', '1-10', '1000'])
+
+    def test_recent_entries(self):
+        update_index(make_history_entries(20), self.history_index)
+        self.assertEqual(list(load_recent_index_entries(self.history_index, 3)), ['17', '18', '19'])
+        since = ('2022.12.15', '11:52:06.184000')
+        recent = load_recent_index_entries(self.history_index, since=since)
+        self.assertEqual(list(recent), ['15', '16', '17', '18', '19'])
+
+class TestCSVIndex(unittest.TestCase):
+    def test_recent_entries(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            # Indexes that aren't stored in SQLite are read from the end of the CSV file
+            index_name = os.path.join(tmpdir, 'other_index.csv')
+            update_index(make_history_entries(20), index_name)
+            self.assertEqual(list(load_recent_index_entries(index_name, 3)), ['17', '18', '19'])
+            self.assertEqual(len(load_recent_index_entries(index_name, 30)), 20)
+            self.assertEqual(load_recent_index_entries(index_name, 0), {})
+            for day, expected in [(15, 5), (0, 20), (20, 0)]:
+                since = ('2022.12.{:02d}'.format(day), '11:52:06.184000')
+                recent = load_recent_index_entries(index_name, since=since)
+                self.assertEqual(len(recent), expected)
+            recent = load_recent_index_entries(index_name, 2, since=('2022.12.15', '00:00:00'))
+            self.assertEqual(list(recent), ['18', '19'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import json
+import os
+import subprocess
+import tempfile
+import unittest
+
+from onager.backends._backend import Backend
+from onager.jobfile import Jobfile, append_jobfile, get_index_path, write_jobfile
+from onager.jobfile import write_commands_file
+from onager.utils import load_jobfile, save_jobfile
+
+class TestIndexedJobfile(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.jobfile_path = os.path.join(self.tmpdir.name, 'jobs.jsonl')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_lookup(self):
+        write_jobfile([(1, 'echo 1', 'tag_1'), (2, 'echo 2', 'tag_2'), (5, 'echo 5', '')],
+                      self.jobfile_path)
+        jobfile = Jobfile(self.jobfile_path)
+        self.assertEqual(jobfile[2], 'echo 2')
+        self.assertEqual(jobfile.get_tag(1), 'tag_1')
+        self.assertEqual(list(jobfile), [1, 2, 5])
+        self.assertEqual(len(jobfile), 3)
+        self.assertNotIn(3, jobfile)
+        self.assertNotIn(6, jobfile)
+
+    def test_round_trip(self):
+        jobs = {i: ('echo "{}"'.format(i), 'tag_{}'.format(i)) for i in range(1, 101)}
+        save_jobfile(jobs, self.jobfile_path)
+        self.assertTrue(os.path.exists(get_index_path(self.jobfile_path)))
+        cmds, tags = load_jobfile(self.jobfile_path)
+        self.assertEqual(cmds, {i: jobs[i][0] for i in jobs})
+        self.assertEqual(tags, {i: jobs[i][1] for i in jobs})
+
+    def test_append(self):
+        write_jobfile([(1, 'echo 1', 'tag_1'), (2, 'echo 2', 'tag_2')], self.jobfile_path)
+        with open(self.jobfile_path, 'rb') as file:
+            original = file.read()
+        reader = Jobfile(self.jobfile_path)
+        self.assertEqual(reader.get_next_id(), 3)
+        append_jobfile([(3, 'echo 3', 'tag_3'), (4, 'echo 4', 'tag_4')], self.jobfile_path)
+        # The existing records are untouched, and an open reader sees the new ones
+        with open(self.jobfile_path, 'rb') as file:
+            self.assertTrue(file.read().startswith(original))
+        self.assertEqual(reader[4], 'echo 4')
+        self.assertEqual(list(reader), [1, 2, 3, 4])
+        self.assertEqual(reader.get_next_id(), 5)
+        reader.close()
+        with self.assertRaises(ValueError):
+            append_jobfile([(4, 'echo again', '')], self.jobfile_path)
+        self.assertEqual(Jobfile(self.jobfile_path)[4], 'echo 4')
+
+    def test_native_command_lookup(self):
+        write_jobfile([(1, 'echo 1', ''), (3, "echo 'a  b' \"$((1 + 2))\"", '')], self.jobfile_path)
+        commands_path = write_commands_file(self.jobfile_path)
+        body = Backend().native_body.format(task_id='$1', commands=commands_path,
+                                            index=get_index_path(commands_path))
+        run = lambda task_id: subprocess.run(['bash', '-c', body, 'wrapper', str(task_id)],
+                                             stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self.assertEqual(run(3).stdout.decode().splitlines()[-1], 'a  b 3')
+        self.assertEqual(run(1).stdout.decode().splitlines()[-1], '1')
+        for missing_id in [0, 2, 4]:
+            self.assertEqual(run(missing_id).returncode, 1)
+
+    def test_legacy_jobfile(self):
+        legacy_path = os.path.join(self.tmpdir.name, 'jobs.json')
+        with open(legacy_path, 'w') as file:
+            json.dump({1: ('echo 1', 'tag_1'), 2: ('echo 2', 'tag_2')}, file)
+        cmds, tags = load_jobfile(legacy_path)
+        self.assertEqual(cmds, {1: 'echo 1', 2: 'echo 2'})
+        self.assertEqual(Jobfile(legacy_path).get_tag(2), 'tag_2')
+
+if __name__ == '__main__':
+    unittest.main()
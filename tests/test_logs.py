@@ -0,0 +1,98 @@
+import io
+import os
+import re
+import tempfile
+import unittest
+
+from onager import logs
+from onager.logs import JobLogs, LogPack, get_sharded_log_path, write_log_pack
+from onager.logs import grep_lines, tail_lines
+from onager.taskset import TaskSet
+from onager.utils import JobIndexEntry
+
+class TestLogs(unittest.TestCase):
+    def test_pack_sharded_logs(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            os.chdir(tmpdir)
+            try:
+                entry = JobIndexEntry('job', 'jobs.jsonl', 'local')
+                log_dir = os.path.join('.onager', 'logs', 'local', 'job_7')
+                contents = {1: b'short\n', 300: b'x' * 10000}
+                for task_id, data in contents.items():
+                    stdout_path = get_sharded_log_path(log_dir, task_id, '.o')
+                    os.makedirs(os.path.dirname(stdout_path), exist_ok=True)
+                    with open(stdout_path, 'wb') as file:
+                        file.write(data)
+                self.assertEqual(os.path.dirname(stdout_path), os.path.join(log_dir, '2c'))
+
+                job_logs = JobLogs(7, entry)
+                self.assertTrue(job_logs.sharded)
+                packed = write_log_pack(job_logs, TaskSet.from_string('1-300'),
+                                        compress_threshold=100)
+                self.assertEqual(len(packed), 2)
+
+                pack = LogPack(job_logs.get_pack_path())
+                self.assertEqual(pack.read(1), contents[1])
+                self.assertEqual(pack.read(300), contents[300])
+                self.assertIsNone(pack.read(1, stream=1))
+                self.assertIsNone(pack.read(2))
+                self.assertIsNone(pack.read(1000))
+                pack.close()
+                self.assertLess(os.path.getsize(job_logs.get_pack_path()), 1000)
+
+                # Packing again (e.g. after the originals were removed) keeps the packed logs
+                os.remove(get_sharded_log_path(log_dir, 1, '.o'))
+                self.assertEqual(write_log_pack(job_logs, TaskSet.from_string('1-300')),
+                                 [get_sharded_log_path(log_dir, 300, '.o')])
+                pack = LogPack(job_logs.get_pack_path())
+                self.assertEqual(pack.read(1), contents[1])
+                self.assertEqual(pack.read(300), contents[300])
+                pack.close()
+            finally:
+                os.chdir(cwd)
+
+    def test_search_logs_in_parallel(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            os.chdir(tmpdir)
+            try:
+                entry = JobIndexEntry('job', 'jobs.jsonl', 'local')
+                log_dir = os.path.join('.onager', 'logs', 'local', 'job_7')
+                for task_id in range(1, 201):
+                    stdout_path = get_sharded_log_path(log_dir, task_id, '.o')
+                    os.makedirs(os.path.dirname(stdout_path), exist_ok=True)
+                    with open(stdout_path, 'wb') as file:
+                        file.write(b'task %d\nloss %s\n' % (task_id, b'nan' if task_id % 50 else b'0.1'))
+                job_logs = JobLogs(7, entry)
+                write_log_pack(job_logs, TaskSet.from_string('1-100'))
+
+                results = list(logs.iter_search_results(job_logs, TaskSet.from_string('1-200'),
+                                                        [0], None, '0\\.1', 2))
+                self.assertEqual([result[0] for result in results], list(range(1, 201)))
+                self.assertEqual([result for result in results if result[2]],
+                                 [(task_id, 0, [b'loss 0.1']) for task_id in (50, 100, 150, 200)])
+            finally:
+                os.chdir(cwd)
+
+    def test_tail_lines(self):
+        data = b''.join(b'line %d\n' % i for i in range(1000))
+        logs.TAIL_BLOCK_SIZE, block_size = 16, logs.TAIL_BLOCK_SIZE
+        try:
+            self.assertEqual(tail_lines(io.BytesIO(data), 3),
+                             [b'line 997', b'line 998', b'line 999'])
+            self.assertEqual(len(tail_lines(io.BytesIO(data), 2000)), 1000)
+            self.assertEqual(tail_lines(io.BytesIO(b'no newline'), 1), [b'no newline'])
+            self.assertEqual(tail_lines(io.BytesIO(data), 0), [])
+        finally:
+            logs.TAIL_BLOCK_SIZE = block_size
+
+    def test_grep_lines(self):
+        data = b'loss 0.5\nloss nan\nacc nan nan\nloss 0.1\nnan'
+        regex = re.compile(b'nan', re.MULTILINE)
+        self.assertEqual(list(grep_lines(data, regex)), [b'loss nan', b'acc nan nan', b'nan'])
+        regex = re.compile(b'^loss', re.MULTILINE)
+        self.assertEqual(len(list(grep_lines(data, regex))), 3)
+
+if __name__ == '__main__':
+    unittest.main()
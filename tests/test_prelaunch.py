@@ -1,5 +1,9 @@
 import unittest
+from unittest import mock
 
+from onager import frontend, meta_launcher
+from onager.sweep import SweepSpec
+from onager.utils import load_jobfile
 from tests.test_utils import run_meta_launcher
 
 class TestPrelaunchMisc(unittest.TestCase):
@@ -160,6 +164,38 @@ class TestPrelaunchOptionalArgs(unittest.TestCase):
         jobs = run_meta_launcher(cmd)
         self.assertEqual("echo --value 1 --tag testecho_01__value_1", jobs[0][1])
 
+class TestPrelaunchCompact(unittest.TestCase):
+
+    def assertCompactMatchesExpanded(self, cmd):
+        expanded_jobs = run_meta_launcher(cmd)
+        compact_jobs = run_meta_launcher(cmd + " +compact")
+        self.assertEqual(expanded_jobs, compact_jobs)
+
+    def test_compact_combined(self):
+        self.assertCompactMatchesExpanded("prelaunch +command echo +jobname testecho +arg --test hi bye +pos-arg 0 1 2 +flag --help +flag --verbose +q +tag")
+
+    def test_compact_tag_args(self):
+        self.assertCompactMatchesExpanded("prelaunch +command echo +jobname testecho +arg --a 1 2 +arg --b 3 4 +arg --c +q +tag +tag-args --b --c")
+
+    def test_compact_hydra(self):
+        self.assertCompactMatchesExpanded("prelaunch +command echo +jobname testecho +arg-mode hydra +arg lr 1 2 3 4 5 6 7 8 9 10 +q +tag +no-tag-number")
+
+    def test_compact_append(self):
+        cmd = "prelaunch +command echo +jobname testecho +arg --value 1 2 3 4 5 +q +tag"
+        run_meta_launcher(cmd + " +compact")
+        jobs = run_meta_launcher(cmd + " +a")
+        self.assertEqual(len(jobs[0]), 10)
+        self.assertEqual("echo --value 5 --tag testecho_10__value_5", jobs[0][10])
+        self.assertEqual("testecho_06__value_1", jobs[1][6])
+
+    def test_quiet_compact_does_not_expand(self):
+        cmd = "prelaunch +command echo +jobname testecho +arg --value 1 2 3 +q +compact"
+        args, _ = frontend.parse_args(cmd.split(' '))
+        with mock.patch.object(SweepSpec, 'iter_records',
+                               side_effect=AssertionError('expanded the sweep')):
+            meta_launcher.meta_launch(args)
+        jobs = load_jobfile(args.jobfile.format(jobname=args.jobname))
+        self.assertEqual(len(jobs[0]), 3)
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,57 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from onager.hostslots import HostSlots
+from onager.resources import ResourceScheduler, waitstatus_to_exitcode
+
+class TestResourceScheduler(unittest.TestCase):
+    def test_disjoint_cpu_sets(self):
+        scheduler = ResourceScheduler(cpus_per_task=1, pin_cpus=True)
+        scheduler.free_cpus = [0, 1, 2]
+
+        async def allocate():
+            allocations = [await scheduler.acquire() for _ in range(3)]
+            admitted_while_full = scheduler.can_admit()
+            await scheduler.release(allocations[1])
+            return allocations, admitted_while_full, scheduler.can_admit()
+
+        allocations, admitted_while_full, admitted_after_release = asyncio.run(allocate())
+        self.assertEqual([a.cpus for a in allocations], [[0], [1], [2]])
+        self.assertFalse(admitted_while_full)
+        self.assertTrue(admitted_after_release)
+        self.assertEqual(scheduler.free_cpus, [1])
+
+    def test_memory_admission(self):
+        scheduler = ResourceScheduler(mem_per_task=1, mem_admission=True)
+        scheduler.mem_budget = int(1.5 * 1024**3)
+        self.assertTrue(scheduler.can_admit())
+        scheduler.n_running, scheduler.mem_reserved = 1, scheduler.mem_per_task
+        self.assertFalse(scheduler.can_admit())
+
+    def test_host_slots(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            host_slots = HostSlots(slots_dir=os.path.join(tmpdir, 'slots'))
+            host_slots.cpus = [4, 5]
+            scheduler = ResourceScheduler(cpus_per_task=1, pin_cpus=True, host_slots=host_slots)
+
+            async def allocate():
+                allocations = [await scheduler.acquire() for _ in range(2)]
+                await scheduler.release(allocations[0])
+                return allocations
+
+            allocations = asyncio.run(allocate())
+            host_slots.close()
+        # Pinned tasks get the cores of their host-wide CPU slots
+        self.assertEqual([a.cpus for a in allocations], [[4], [5]])
+        self.assertEqual(host_slots.held_cpus, {5})
+
+    def test_waitstatus_to_exitcode(self):
+        for cmd, expected in [('exit 3', 3), ('kill -9 $$', -9)]:
+            pid = os.spawnlp(os.P_NOWAIT, 'sh', 'sh', '-c', cmd)
+            _, status = os.waitpid(pid, 0)
+            self.assertEqual(waitstatus_to_exitcode(status), expected)
+
+if __name__ == '__main__':
+    unittest.main()
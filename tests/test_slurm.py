@@ -0,0 +1,39 @@
+import unittest
+
+from onager.backends.slurm import SlurmBackend
+from onager.taskset import TaskSet
+
+class TestSlurmArrays(unittest.TestCase):
+    def test_split_array(self):
+        backend = SlurmBackend()
+        array_ids = TaskSet.from_string('1-2500:7,1500')
+        chunks = list(backend.split_array(array_ids, max_array_size=1001))
+        self.assertEqual([offset for offset, _ in chunks], [0, 1002, 2003])
+        self.assertEqual(str(chunks[1][1]), '0-497:7,498,504-994:7')
+        self.assertTrue(all(indices[-1] < 1001 for _, indices in chunks))
+        recombined = TaskSet.from_ids(i + offset for offset, indices in chunks for i in indices)
+        self.assertEqual(recombined, array_ids)
+
+    def test_split_long_array_spec(self):
+        backend = SlurmBackend()
+        array_ids = TaskSet.from_string('1-100000:2')
+        chunks = list(backend.split_array(array_ids, max_array_size=10**6))
+        self.assertEqual([str(indices) for _, indices in chunks], ['1-99999:2'])
+        array_ids = TaskSet.from_ids(range(1, 10**5, 7)) - TaskSet.from_string('1-100000:5')
+        chunks = list(backend.split_array(array_ids, max_array_size=10**6))
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(len(str(indices)) <= 10000 for _, indices in chunks))
+
+    def test_cancel_cmds(self):
+        backend = SlurmBackend()
+        cancellations = [('13438569', TaskSet.from_string('1-3,5,8-9,20-26:3')), ('42', None)]
+        self.assertEqual(backend.get_cancel_cmds(cancellations),
+                         ["scancel '13438569_[1-3,5,8-9,20,23,26]'", 'scancel 42'])
+        taskset = TaskSet.from_ids(range(0, 200000, 3))
+        cmds = backend.get_cancel_cmds([('7', taskset)])
+        self.assertGreater(len(cmds), 1)
+        self.assertTrue(all(len(cmd) <= 32768 for cmd in cmds))
+        self.assertTrue(all(cmd.startswith("scancel '7_[") and cmd.endswith("]'") for cmd in cmds))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+
+from onager.state import (StateRecorder, load_task_states, summarize, get_resume_tasks,
+                          is_native_job)
+
+class TestStateStore(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmpdir.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmpdir.cleanup()
+
+    def test_state_transitions_across_hosts(self):
+        StateRecorder('12', host='login').record_queued('1-5')
+        node1, node2 = StateRecorder('12', host='node1'), StateRecorder('12', host='node2')
+        node1.record_finished(1, 0, node1.record_running(1))
+        node1.record_finished(2, -9, node1.record_running(2))
+        node2.record_finished(3, 3, node2.record_running(3))
+        node2.record_running(4)
+
+        states = load_task_states('12')
+        self.assertEqual(states[2].state, 'signaled')
+        self.assertEqual(states[2].returncode, -9)
+        self.assertEqual((states[3].returncode, states[3].host), (3, 'node2'))
+        self.assertEqual(states[5].state, 'queued')
+        counts = summarize(states)
+        self.assertEqual((counts['completed'], counts['failed'], counts['running'],
+                          counts['queued']), (1, 2, 1, 1))
+
+    def test_latest_attempt_wins(self):
+        recorder = StateRecorder('7', host='node1')
+        recorder.record_finished(1, 1, recorder.record_running(1))
+        recorder.record_finished(1, 0, recorder.record_running(1))
+        self.assertEqual(load_task_states('7')[1].returncode, 0)
+
+    def test_resume_carries_failures_forward(self):
+        recorder = StateRecorder('1', host='node1')
+        recorder.record_queued('1-4')
+        recorder.record_finished(1, 0, recorder.record_running(1))
+        recorder.record_finished(2, 1, recorder.record_running(2))
+        recorder.record_running(3)
+        remaining, failures = get_resume_tasks('1')
+        self.assertEqual(str(remaining), '2-4')
+        self.assertEqual(failures, {2: 1})
+
+        resumed = StateRecorder('2', host='node1')
+        resumed.record_queued(remaining, failures)
+        resumed.record_finished(2, 1, resumed.record_running(2))
+        self.assertEqual(load_task_states('2')[2].n_failures, 2)
+        self.assertEqual(str(get_resume_tasks('2', retry_failed=1)[0]), '3-4')
+        self.assertEqual(str(get_resume_tasks('2', retry_failed=2)[0]), '2-4')
+
+    def test_native_jobs(self):
+        StateRecorder('3', host='login').record_queued('1-5')
+        StateRecorder('4', host='login').record_queued('1-5', native=True)
+        self.assertFalse(is_native_job('3'))
+        self.assertTrue(is_native_job('4'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+
+from onager.engine import run_tasks
+from onager.stats import percentile, suggest_resources, format_duration
+
+class TestStats(unittest.TestCase):
+    def test_suggest_resources(self):
+        distributions = {
+            'cpu utilization': sorted([0.9, 1.0, 1.8, 3.5]),
+            'peak RSS (MB)': sorted([500, 900, 3000]),
+            'wall time (s)': sorted([30, 600, 5000]),
+        }
+        self.assertEqual(percentile([1, 2, 3, 4, 5], 0.5), 3)
+        self.assertEqual(format_duration(90000), '1-01:00:00')
+        self.assertEqual(suggest_resources(distributions),
+                         '--cpus 4 --mem 4 --duration 0-02:05:00')
+
+    def test_engine_collects_usage(self):
+        usages = []
+
+        class Recorder:
+            def record_running(self, task_id):
+                return 0.0
+
+            def record_finished(self, task_id, returncode, start, usage):
+                usages.append((task_id, returncode, usage))
+
+        run_tasks([(1, 'exit 3', None, None)], 1, quiet=True, recorder=Recorder())
+        [(task_id, returncode, usage)] = usages
+        self.assertEqual((task_id, returncode), (1, 3))
+        self.assertGreater(usage['maxrss'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
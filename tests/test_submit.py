@@ -0,0 +1,41 @@
+import os
+import tempfile
+import unittest
+
+from onager import submit
+from onager.submit import submit_commands, parse_jobid
+
+class TestSubmit(unittest.TestCase):
+    def setUp(self):
+        self.backoff = submit.BACKOFF_SECONDS
+        submit.BACKOFF_SECONDS = 0
+
+    def tearDown(self):
+        submit.BACKOFF_SECONDS = self.backoff
+
+    def test_parse_jobid(self):
+        self.assertEqual(parse_jobid('13438569\n'), '13438569')
+        self.assertEqual(parse_jobid('13438569;cluster\n'), '13438569')
+        self.assertEqual(parse_jobid('4821.1-10:1\n'), '4821')
+        for output in ['', '\n', 'sbatch: error: try again\n']:
+            self.assertIsNone(parse_jobid(output))
+
+    def test_results_in_order(self):
+        results = submit_commands(['sleep 0.{}; echo {}'.format(9 - i, i) for i in range(8)],
+                                  max_workers=8)
+        self.assertEqual([result.output for result in results],
+                         ['{}\n'.format(i) for i in range(8)])
+
+    def test_retry_transient_errors(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            marker = os.path.join(tmpdir, 'failed_once')
+            flaky = ('if [ -e {0} ]; then echo 42; else touch {0}; '
+                     'echo "Socket timed out" >&2; exit 1; fi').format(marker)
+            broken = 'echo "invalid partition" >&2; exit 1'
+            results = submit_commands([flaky, broken], max_retries=2)
+        self.assertEqual(results[0].output, '42\n')
+        self.assertIsNone(results[0].error)
+        self.assertEqual(results[1].error, 'invalid partition')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import random
+import unittest
+
+from onager.taskset import TaskSet
+from onager.utils import condense_ids, expand_ids, split_tasklist_into_subjob_groups
+
+class TestTaskSet(unittest.TestCase):
+    def test_parse_and_format(self):
+        taskset = TaskSet.from_string("18-22:1,26,29,34-49:3,51")
+        self.assertEqual(str(taskset), "18-22,26,29,34-49:3,51")
+        self.assertEqual(taskset.to_gridengine(), ["18-22", "26", "29", "34-49:3", "51"])
+        self.assertEqual(list(TaskSet.from_string("5,1-3")), [1, 2, 3, 5])
+
+    def test_large_ranges(self):
+        taskset = TaskSet.from_string("1-1000000")
+        self.assertEqual(len(taskset), 1000000)
+        self.assertIn(999999, taskset)
+        evens = taskset - TaskSet.from_string("1-1000000:2")
+        self.assertEqual(str(evens), "2-1000000:2")
+        self.assertEqual(str(evens & TaskSet.from_string("1-1000000:3")), "4-1000000:6")
+        self.assertEqual(str(taskset.slice(10, 20)), "11-20")
+        self.assertEqual(taskset[-1], 1000000)
+
+    def test_set_operations_match_python_sets(self):
+        rng = random.Random(0)
+        def random_ids():
+            ids = set()
+            for _ in range(rng.randint(0, 4)):
+                first = rng.randint(0, 60)
+                ids |= set(range(first, first + rng.randint(0, 40), rng.choice([1, 2, 3, 4, 6])))
+            return ids
+        for _ in range(500):
+            a, b = random_ids(), random_ids()
+            taskset_a, taskset_b = TaskSet.from_ids(a), TaskSet.from_ids(b)
+            self.assertEqual(list(taskset_a | taskset_b), sorted(a | b))
+            self.assertEqual(list(taskset_a & taskset_b), sorted(a & b))
+            self.assertEqual(list(taskset_a - taskset_b), sorted(a - b))
+            self.assertEqual([x for x in range(110) if x in taskset_a], sorted(a))
+
+    def test_chunks(self):
+        chunks = [str(chunk) for chunk in TaskSet.from_string("1-10,20-30").chunks(4)]
+        self.assertEqual(chunks, ["1-4", "5-8", "9-10,20-21", "22-25", "26-29", "30"])
+
+    def test_wrappers(self):
+        self.assertEqual(condense_ids([1, 2, 3, 5, 8, 9]), "1-3,5,8-9")
+        self.assertEqual(expand_ids("1-3,7-11:2"), [1, 2, 3, 7, 9, 11])
+        self.assertEqual(split_tasklist_into_subjob_groups("1-7", 3), ["1-3", "4-6", "7"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,21 @@
+import os
+import tempfile
+import unittest
+
+from onager.taskset import TaskSet
+from onager.workqueue import WorkQueue
+
+class TestWorkQueue(unittest.TestCase):
+    def test_nodes_share_cursor(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cursor_path = os.path.join(tmpdir, 'queue_1.cursor')
+            taskset = TaskSet.from_string('1-10:3,20-22')
+            node1 = iter(WorkQueue(taskset, cursor_path))
+            node2 = iter(WorkQueue(taskset, cursor_path))
+            claimed = [next(node1), next(node2), next(node2)]
+            claimed += list(node1)
+            self.assertEqual(claimed, list(taskset))
+            self.assertEqual(list(node2), [])
+
+if __name__ == '__main__':
+    unittest.main()